@@ -0,0 +1,234 @@
+import os
+import sys
+import json
+import time
+import zlib
+import random
+import hashlib
+import argparse
+import itertools
+import multiprocessing
+
+import numpy as np
+
+import connect_4_ia as juego
+from entorno_vectorizado import EntornoVectorizado, entrenar_td
+
+# -------- BARRIDO DE HIPERPARÁMETROS DEL APRENDIZ TD --------
+#
+# Cada combinación de parámetros es un trabajo aislado que corre en su propio
+# proceso (uno nuevo por trabajo, así no se arrastran globales ni V de otro):
+#
+#   1. parte de una tabla V vacía y una semilla propia,
+#   2. entrena (opcionalmente primero contra un rival aleatorio en el entorno
+#      vectorizado, luego contra Minimax perfecta y semiperfecta alternadas),
+#   3. se evalúa sin aprender contra ambas con EPSILON_HUMAN.
+#
+# Cada resultado se añade como una línea JSON al archivo de resultados en
+# cuanto termina; al relanzar el mismo barrido se saltan los trabajos que ya
+# están ahí, así que se puede interrumpir y continuar.
+#
+#   python barrido_hiperparametros.py -p ALPHA=0.05,0.1,0.2 -p MAX_DEPTH=2,4
+#   python barrido_hiperparametros.py -p ALPHA=0.01:0.3 -p EPSILON_TRAIN=0.05:0.4 --aleatorio 20
+
+PARAMETROS = ("ALPHA", "EPSILON_TRAIN", "EPSILON_HUMAN", "MAX_DEPTH", "ERROR_PROB")
+RIVALES = (juego.ROLE_MINIMAX_PERF, juego.ROLE_MINIMAX_SEMI)
+RESULTADOS_FILE = "barrido_resultados.jsonl"
+TABLEROS_VECTORIZADOS = 256
+
+
+# -------- ESPACIO DE BÚSQUEDA --------
+
+def leer_espacio(especificaciones):
+    """
+    'NOMBRE=a,b,c' es una lista de valores; 'NOMBRE=a:b' un rango (solo
+    búsqueda aleatoria). Los valores toman el tipo del parámetro en connect_4_ia.
+    """
+    espacio = {}
+    for espec in especificaciones:
+        nombre, _, valores = espec.partition("=")
+        nombre = nombre.strip().upper()
+        if nombre not in PARAMETROS:
+            raise ValueError(f"Parámetro desconocido: {nombre} (se puede barrer {', '.join(PARAMETROS)})")
+        tipo = type(getattr(juego, nombre))
+        if ":" in valores:
+            bajo, alto = (tipo(v) for v in valores.split(":"))
+            espacio[nombre] = (bajo, alto)
+        else:
+            espacio[nombre] = [tipo(v) for v in valores.split(",")]
+    return espacio
+
+
+def combinaciones(espacio, aleatorio, semilla):
+    """Lista de dicts de parámetros: producto cartesiano o `aleatorio` muestras."""
+    nombres = sorted(espacio)
+    if not aleatorio:
+        rangos = [n for n in nombres if isinstance(espacio[n], tuple)]
+        if rangos:
+            raise ValueError(f"Los rangos ({', '.join(rangos)}) solo sirven con --aleatorio")
+        return [dict(zip(nombres, valores))
+                for valores in itertools.product(*(espacio[n] for n in nombres))]
+
+    rng = random.Random(semilla)
+    muestras = []
+    for _ in range(aleatorio):
+        params = {}
+        for n in nombres:
+            opciones = espacio[n]
+            if isinstance(opciones, list):
+                params[n] = rng.choice(opciones)
+            elif isinstance(opciones[0], int):
+                params[n] = rng.randint(*opciones)
+            else:
+                params[n] = round(rng.uniform(*opciones), 4)
+        muestras.append(params)
+    return muestras
+
+
+def crear_trabajos(lista_params, semilla, entrenamiento, aleatorias, evaluacion):
+    trabajos = []
+    for params in lista_params:
+        # El id y la semilla dependen solo de la configuración, no del orden
+        clave = json.dumps([params, semilla, entrenamiento, aleatorias, evaluacion], sort_keys=True)
+        trabajos.append({
+            "id": hashlib.sha1(clave.encode()).hexdigest()[:12],
+            "params": params,
+            "semilla": zlib.crc32(clave.encode()),
+            "entrenamiento": entrenamiento,
+            "aleatorias": aleatorias,
+            "evaluacion": evaluacion,
+        })
+    return trabajos
+
+
+# -------- TRABAJO (EN EL PROCESO HIJO) --------
+
+def ejecutar_trabajo(trabajo):
+    t0 = time.time()
+    random.seed(trabajo["semilla"])
+    np.random.seed(trabajo["semilla"] % (1 << 32))
+    for nombre, valor in trabajo["params"].items():
+        setattr(juego, nombre, valor)
+    juego.MINIMAX_WORKERS = 1
+    juego.V = {}
+    # Un .prom por trabajo (se reemplaza entero al exportar) y el .jsonl compartido, con el id en cada muestra
+    base, ext = os.path.splitext(juego.METRICS_PROM_FILE)
+    juego.telemetria.ruta_prom = f"{base}_barrido_{trabajo['id']}{ext}"
+    juego.telemetria.etiquetas = {"trabajo": trabajo["id"]}
+
+    if trabajo["aleatorias"]:
+        entorno = EntornoVectorizado(TABLEROS_VECTORIZADOS, juego.ROW_COUNT, juego.COLUMN_COUNT,
+                                     juego.CONNECT_N, semilla=trabajo["semilla"])
+        entrenar_td(entorno, juego.V, trabajo["aleatorias"], juego.ALPHA, juego.EPSILON_TRAIN,
+                    telemetria=juego.telemetria)
+    for i in range(trabajo["entrenamiento"]):
+        juego.jugar_partida_sin_gui(RIVALES[i % 2], juego.EPSILON_TRAIN)
+
+    resultados = {}
+    for rol in RIVALES:
+        conteo = {"td_wins": 0, "opp_wins": 0, "draws": 0}
+        for _ in range(trabajo["evaluacion"]):
+            ganador = juego.jugar_partida_sin_gui(rol, juego.EPSILON_HUMAN, aprender=False)
+            if ganador is None:
+                conteo["draws"] += 1
+            elif ganador == juego.J1:
+                conteo["td_wins"] += 1
+            else:
+                conteo["opp_wins"] += 1
+        resultados[rol] = conteo
+
+    # Las posiciones buscadas quedan para los demás trabajos con la misma MAX_DEPTH
+    juego.guardar_cache()
+    juego.telemetria.exportar()
+    return dict(trabajo, resultados=resultados, estados_v=len(juego.V), segundos=round(time.time() - t0, 1))
+
+
+# -------- RESULTADOS --------
+
+def leer_resultados(ruta):
+    """{id: resultado} de las líneas completas del archivo (una línea cortada se ignora)."""
+    hechos = {}
+    if not os.path.exists(ruta):
+        return hechos
+    with open(ruta, "r") as f:
+        for linea in f:
+            try:
+                r = json.loads(linea)
+                hechos[r["id"]] = r
+            except (ValueError, KeyError):
+                continue
+    return hechos
+
+
+def winrate(resultado, rol):
+    conteo = resultado["resultados"][rol]
+    return 100.0 * conteo["td_wins"] / max(1, sum(conteo.values()))
+
+
+def imprimir_resumen(resultados):
+    if not resultados:
+        print("Sin resultados todavía.")
+        return
+    nombres = sorted({n for r in resultados for n in r["params"]})
+    orden = sorted(resultados, key=lambda r: -sum(winrate(r, rol) for rol in RIVALES))
+    cabecera = [f"{n:>13}" for n in nombres] + [f"{'% vs perfecta':>13}", f"{'% vs semi':>10}",
+                                                f"{'estados V':>10}", f"{'seg':>7}"]
+    print(" ".join(cabecera))
+    for r in orden:
+        fila = [f"{r['params'].get(n, getattr(juego, n))!s:>13}" for n in nombres]
+        fila += [f"{winrate(r, juego.ROLE_MINIMAX_PERF):>13.1f}", f"{winrate(r, juego.ROLE_MINIMAX_SEMI):>10.1f}",
+                 f"{r['estados_v']:>10}", f"{r['segundos']:>7}"]
+        print(" ".join(fila))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Barrido de hiperparámetros del aprendiz TD en paralelo.")
+    parser.add_argument("-p", "--param", action="append", default=[],
+                        help="NOMBRE=v1,v2,... o NOMBRE=min:max (repetible); por defecto ALPHA y EPSILON_TRAIN")
+    parser.add_argument("--aleatorio", type=int, default=0,
+                        help="número de combinaciones al azar en lugar de la rejilla completa")
+    parser.add_argument("--entrenamiento", type=int, default=200,
+                        help="partidas de entrenamiento contra Minimax por trabajo")
+    parser.add_argument("--aleatorias", type=int, default=0,
+                        help="partidas previas contra un rival aleatorio en el entorno vectorizado")
+    parser.add_argument("--evaluacion", type=int, default=50,
+                        help="partidas de evaluación contra cada rival")
+    parser.add_argument("--procesos", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--salida", default=RESULTADOS_FILE)
+    parser.add_argument("--solo-resumen", action="store_true",
+                        help="no correr nada, solo mostrar la tabla de lo ya terminado")
+    args = parser.parse_args()
+
+    try:
+        espacio = leer_espacio(args.param or ["ALPHA=0.05,0.1,0.2", "EPSILON_TRAIN=0.1,0.2,0.3"])
+        trabajos = crear_trabajos(combinaciones(espacio, args.aleatorio, args.semilla), args.semilla,
+                                  args.entrenamiento, args.aleatorias, args.evaluacion)
+    except ValueError as e:
+        parser.error(str(e))
+
+    hechos = leer_resultados(args.salida)
+    pendientes = [t for t in trabajos if t["id"] not in hechos]
+    print(f"{len(trabajos)} trabajos, {len(trabajos) - len(pendientes)} ya terminados, "
+          f"{len(pendientes)} pendientes.")
+
+    if pendientes and not args.solo_resumen:
+        # spawn y un proceso nuevo por trabajo: cada uno parte de connect_4_ia limpio
+        contexto = multiprocessing.get_context("spawn")
+        with contexto.Pool(min(args.procesos, len(pendientes)), maxtasksperchild=1) as pool:
+            try:
+                with open(args.salida, "a") as f:
+                    for n, r in enumerate(pool.imap_unordered(ejecutar_trabajo, pendientes), 1):
+                        f.write(json.dumps(r) + "\n")
+                        f.flush()
+                        hechos[r["id"]] = r
+                        print(f"[{n}/{len(pendientes)}] {r['params']} -> "
+                              f"perfecta {winrate(r, juego.ROLE_MINIMAX_PERF):.1f}% | "
+                              f"semi {winrate(r, juego.ROLE_MINIMAX_SEMI):.1f}% ({r['segundos']} s)")
+            except KeyboardInterrupt:
+                pool.terminate()
+                print("Interrumpido; los trabajos terminados quedaron guardados.")
+                imprimir_resumen([hechos[t["id"]] for t in trabajos if t["id"] in hechos])
+                sys.exit(1)
+
+    imprimir_resumen([hechos[t["id"]] for t in trabajos if t["id"] in hechos])
@@ -0,0 +1,132 @@
+import os
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from tabla_finales import Bitboard
+
+# -------- CACHE DE JUGADAS DE MINIMAX --------
+#
+# posición -> columnas empatadas con el mejor valor de minimax, con desalojo
+# LRU. La clave es la misma del bitboard de la tabla de finales (piezas de
+# quien mueve + máscara + fila inferior, un uint64); el valor es una máscara
+# de bits de columnas, así que al consultar se puede sortear entre todas las
+# jugadas igual de buenas en lugar de repetir siempre la misma.
+#
+# En disco es un .npz de la variante y profundidad dadas, escrito de forma
+# atómica (os.replace). Varios procesos pueden leerlo a la vez; al guardar se
+# mezclan las entradas del archivo con las propias bajo un lock corto, así
+# ninguno pisa lo que aportaron los demás.
+
+LOCK_ESPERA_SEG = 5.0
+LOCK_VENCIDO_SEG = 30.0
+
+
+class CacheJugadas:
+    def __init__(self, filas, columnas, conecta, profundidad, capacidad, firma=0):
+        if (filas + 1) * columnas > 64:
+            raise ValueError(f"Un tablero de {filas}x{columnas} no cabe en 64 bits")
+        self.bb = Bitboard(filas, columnas, conecta)
+        self.profundidad = profundidad
+        self.capacidad = capacidad
+        self.firma = firma               # Cambia si cambia lo que evalúa minimax (p. ej. la tabla de finales)
+        self.datos = OrderedDict()       # clave -> máscara de columnas, de la más antigua a la más reciente
+        self.nuevas = 0                  # Entradas añadidas desde la última carga/guardado
+        self.aciertos = 0
+        self.fallos = 0
+
+    def __len__(self):
+        return len(self.datos)
+
+    def clave(self, tablero, mover):
+        return self.bb.clave_tablero(tablero, mover)
+
+    def consultar(self, clave):
+        """Lista de columnas empatadas, o None si la posición no está."""
+        mascara = self.datos.get(clave)
+        if mascara is None:
+            self.fallos += 1
+            return None
+        self.datos.move_to_end(clave)
+        self.aciertos += 1
+        return [c for c in range(self.bb.columnas) if mascara >> c & 1]
+
+    def guardar_jugadas(self, clave, columnas):
+        self.datos[clave] = sum(1 << c for c in columnas)
+        self.datos.move_to_end(clave)
+        self.nuevas += 1
+        while len(self.datos) > self.capacidad:
+            self.datos.popitem(last=False)
+
+    # -------- PERSISTENCIA --------
+
+    def _meta(self):
+        return np.array([self.bb.filas, self.bb.columnas, self.bb.conecta,
+                         self.profundidad, self.firma], dtype=np.int64)
+
+    def _leer(self, ruta):
+        """(claves, máscaras) del archivo si es de esta variante y profundidad; si no, arreglos vacíos."""
+        vacio = np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.uint32)
+        if not os.path.exists(ruta):
+            return vacio
+        try:
+            with np.load(ruta) as datos:
+                if not np.array_equal(datos["meta"], self._meta()):
+                    return vacio
+                return datos["claves"], datos["mascaras"]
+        except Exception:
+            return vacio
+
+    def cargar(self, ruta):
+        """Añade las entradas del archivo como las menos recientes."""
+        claves, mascaras = self._leer(ruta)
+        previas = self.datos
+        self.datos = OrderedDict(zip(claves.tolist(), mascaras.tolist()))
+        for clave, mascara in previas.items():
+            self.datos[clave] = mascara
+            self.datos.move_to_end(clave)
+        while len(self.datos) > self.capacidad:
+            self.datos.popitem(last=False)
+        return self
+
+    def guardar(self, ruta):
+        """Mezcla con lo que haya en disco y reescribe el archivo. Devuelve False si no consiguió el lock."""
+        if self.nuevas == 0:
+            return True
+        lock = ruta + ".lock"
+        if not _tomar_lock(lock):
+            return False
+        try:
+            self.cargar(ruta)
+            meta = self._meta()
+            claves = np.fromiter(self.datos.keys(), dtype=np.uint64, count=len(self.datos))
+            mascaras = np.fromiter(self.datos.values(), dtype=np.uint32, count=len(self.datos))
+            tmp = f"{ruta}.{os.getpid()}.tmp.npz"
+            np.savez(tmp, meta=meta, claves=claves, mascaras=mascaras)
+            os.replace(tmp, ruta)
+            self.nuevas = 0
+        finally:
+            try:
+                os.remove(lock)
+            except OSError:
+                pass
+        return True
+
+
+def _tomar_lock(lock):
+    limite = time.time() + LOCK_ESPERA_SEG
+    while True:
+        try:
+            os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock) > LOCK_VENCIDO_SEG:
+                    os.remove(lock)   # Quedó de un proceso que murió guardando
+                    continue
+            except OSError:
+                continue
+            if time.time() >= limite:
+                return False
+            time.sleep(0.05)
@@ -5,9 +5,11 @@ import math
 import time
 
 # -------- CONFIGURACIÓN --------
-ROW_COUNT = 6
-COLUMN_COUNT = 7
-SQUARESIZE = 100
+# Uso: python conecta4.py [filas columnas [conecta]]
+ROW_COUNT = int(sys.argv[1]) if len(sys.argv) > 2 else 6
+COLUMN_COUNT = int(sys.argv[2]) if len(sys.argv) > 2 else 7
+CONNECT_N = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+SQUARESIZE = 100   # Tamaño máximo; se reduce si el tablero no cabe en pantalla
 RADIUS = int(SQUARESIZE / 2 - 8)
 
 # Colores
@@ -32,27 +34,17 @@ def siguiente_fila_vacia(tablero, col):
         if tablero[r][col] == 0:
             return r
 
-def verificar_ganador(tablero, pieza):
-    # Horizontal
-    for c in range(COLUMN_COUNT - 3):
-        for r in range(ROW_COUNT):
-            if all(tablero[r][c + i] == pieza for i in range(4)):
-                return True
-    # Vertical
-    for c in range(COLUMN_COUNT):
-        for r in range(ROW_COUNT - 3):
-            if all(tablero[r + i][c] == pieza for i in range(4)):
-                return True
-    # Diagonal positiva
-    for c in range(COLUMN_COUNT - 3):
-        for r in range(ROW_COUNT - 3):
-            if all(tablero[r + i][c + i] == pieza for i in range(4)):
-                return True
-    # Diagonal negativa
-    for c in range(COLUMN_COUNT - 3):
-        for r in range(3, ROW_COUNT):
-            if all(tablero[r - i][c + i] == pieza for i in range(4)):
-                return True
+def verificar_ganador(tablero, fila, col, pieza):
+    """Revisa solo las líneas que pasan por la última ficha colocada en (fila, col)"""
+    for dr, dc in ((0, 1), (1, 0), (1, 1), (-1, 1)):
+        en_linea = 1
+        for sentido in (1, -1):
+            r, c = fila + sentido * dr, col + sentido * dc
+            while 0 <= r < ROW_COUNT and 0 <= c < COLUMN_COUNT and tablero[r][c] == pieza:
+                en_linea += 1
+                r, c = r + sentido * dr, c + sentido * dc
+        if en_linea >= CONNECT_N:
+            return True
     return False
 
 def dibujar_tablero(tablero):
@@ -101,6 +93,12 @@ game_over = False
 turno = 0
 
 pygame.init()
+info = pygame.display.Info()
+if info.current_w > 0 and info.current_h > 0:
+    SQUARESIZE = max(30, min(SQUARESIZE,
+                             (info.current_h - 80) // (ROW_COUNT + 1),
+                             (info.current_w - 400) // COLUMN_COUNT))
+    RADIUS = int(SQUARESIZE / 2 - 8)
 width = COLUMN_COUNT * SQUARESIZE + 400
 height = (ROW_COUNT + 1) * SQUARESIZE
 size = (width, height)
@@ -111,7 +109,7 @@ victorias_j1 = 0
 victorias_j2 = 0
 
 screen = pygame.display.set_mode(size)
-pygame.display.set_caption("Conecta 4 - Marcador 🎮")
+pygame.display.set_caption(f"Conecta {CONNECT_N} - Marcador 🎮")
 dibujar_tablero(tablero)
 pygame.display.update()
 
@@ -143,7 +141,7 @@ while True:
                         animar_caida(columna_actual, fila, color_ficha)
                         soltar_pieza(tablero, fila, columna_actual, pieza)
 
-                        if verificar_ganador(tablero, pieza):
+                        if verificar_ganador(tablero, fila, columna_actual, pieza):
                             ganador_texto = f"¡Jugador {pieza} gana!"
                             game_over = True
 
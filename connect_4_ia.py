@@ -6,12 +6,28 @@ import time
 import random
 import os
 import pickle
+import multiprocessing
+
+from replay_buffer import ReplayBuffer
+from registro_partidas import RegistroPartidas, MAX_COLUMNAS as MAX_COLUMNAS_REGISTRO
+from valores_compartidos import PublicadorValores
+from telemetria import Telemetria, BUCKETS_MAGNITUD
+from tabla_finales import TablaFinales
+from mcts import MCTS
+from cache_jugadas import CacheJugadas
+
+try:
+    import resource   # No existe en Windows
+except ImportError:
+    resource = None
 
 # -------- CONFIGURACIÓN GENERAL --------
 
+# Dimensiones por defecto; se cambian en tiempo de ejecución con configurar_tablero()
 ROW_COUNT = 6
 COLUMN_COUNT = 7
-SQUARESIZE = 100
+CONNECT_N = 4      # Fichas en línea para ganar
+SQUARESIZE = 100   # Tamaño máximo de casilla; la ventana lo reduce si no cabe
 RADIUS = int(SQUARESIZE / 2 - 8)
 
 # Colores
@@ -31,6 +47,7 @@ ROLE_HUMANO          = "human"
 ROLE_TD              = "td"
 ROLE_MINIMAX_PERF    = "minimax_perfect"
 ROLE_MINIMAX_SEMI    = "minimax_semi"
+ROLE_MCTS            = "mcts"
 
 # Configuración IA TD
 ALPHA = 0.1
@@ -44,12 +61,70 @@ STATS_FILE  = "td_stats.pkl"     # estadísticas globales
 # Profundidad de Minimax
 MAX_DEPTH = 4
 
+# Procesos para repartir las jugadas raíz de Minimax (0 ó 1 = búsqueda en serie).
+# Cada hijo de la raíz es una tarea y los procesos comparten el mejor valor
+# encontrado para podar con él, pero cada jugada paga el envío de los tableros
+# y los hijos que arrancan a la vez podan menos que en serie. Subirlo solo con
+# varios núcleos libres y profundidades altas, después de medir en esa máquina
+# que la jugada realmente tarda menos.
+MINIMAX_WORKERS = 1
+
 # Probabilidad de error en IA semiperfecta
 ERROR_PROB = 0.25
 
+# Velocidad de la GUI en modos IA vs IA (teclas + y -):
+# (nombre, pausas entre jugadas, animación de caída, dibujar cada ms; 0 = siempre,
+#  guardar V y stats cada N partidas; lo pendiente se guarda al salir)
+VELOCIDADES = [
+    ("Normal",        True,  True,  0,   1),
+    ("Rápida",        False, True,  0,   1),
+    ("Sin animación", False, False, 0,   1),
+    ("Turbo",         False, False, 500, 50),
+]
+TURBO_CADA_N_PARTIDAS = 50   # En turbo también se dibuja el final de cada N-ésima partida
+
+# Presupuesto por jugada de la IA MCTS (ver mcts.py)
+MCTS_TIEMPO_MS = 300
+MCTS_MAX_PLAYOUTS = 0            # 0 = sin límite, solo cuenta el tiempo
+MCTS_PLAYOUT_HEURISTICO = True   # Playouts que ganan en una si pueden (más lentos)
+
+# Buffer de experiencia (replay) para reentrenar V con transiciones pasadas
+REPLAY_PREFIX = "td_replay"      # td_replay_<campo>.npy
+REPLAY_CAPACITY = 200_000        # Transiciones máximas en memoria
+REPLAY_LOTES_POR_PARTIDA = 4     # Minilotes de replay tras cada partida (0 = desactivado)
+REPLAY_TAM_LOTE = 64
+REPLAY_PRIORIZADO = True         # Muestreo priorizado por error TD
+
+# Registro binario de todas las partidas jugadas (ver registro_partidas.py)
+LOG_FILE = "partidas.c4log"
+
+# Tabla de finales exactos (se genera con: python tabla_finales.py K semillas)
+ENDGAME_FILE = "tabla_finales.npz"
+
+# Cache posición -> mejores jugadas de la IA Minimax (ver cache_jugadas.py)
+CACHE_FILE = "cache_minimax.npz"   # Se guarda como cache_minimax_d<MAX_DEPTH>.npz
+CACHE_CAPACIDAD = 500_000          # Posiciones en memoria, desaloja las menos usadas (0 = sin cache)
+CACHE_GUARDAR_CADA = 100           # Partidas entre guardados en modos de entrenamiento
+
+# Telemetría: se exporta cada METRICS_INTERVAL segundos (ver telemetria.py)
+METRICS_PROM_FILE = "td_metrics.prom"     # Formato de texto Prometheus
+METRICS_JSONL_FILE = "td_metrics.jsonl"   # Una muestra JSON por línea
+METRICS_INTERVAL = 10.0
+
 # -------- ESTADO GLOBAL --------
 V = {}                         # Diccionario de valores TD
 episode_states = []            # Estados visitados por la IA aprendiz en una partida
+replay = None                  # ReplayBuffer de la variante actual (ver buffer_replay())
+registro = None                # RegistroPartidas, se crea en configurar_tablero()
+publicador = None              # PublicadorValores de VALUES_FILE (ver publicador_valores())
+v_solo_lectura = False         # Otro proceso escribe V: aquí no se entrena (ver pasar_a_solo_lectura())
+tabla_finales = None           # TablaFinales de la variante actual, si existe ENDGAME_FILE
+firma_finales = 0              # Identifica esa tabla en la cache de Minimax (0 = sin tabla)
+agente_mcts = None             # MCTS del modo 4, conserva su árbol entre jugadas
+_pool = None                   # Procesos de minimax_raiz (ver obtener_pool())
+_mejor_raiz = None             # Mejor valor de la raíz compartido entre esos procesos
+cache_jugadas = None           # CacheJugadas de la variante y MAX_DEPTH actuales (ver cache_minimax())
+telemetria = Telemetria("c4", METRICS_PROM_FILE, METRICS_JSONL_FILE, METRICS_INTERVAL)
 apprentice_mark = None         # 1 ó 2, quién es el aprendiz en el tablero
 game_mode = None               # 1,2,3 según menú
 auto_restart = False           # Si las partidas se encadenan solas (IA vs IA)
@@ -64,6 +139,7 @@ def default_stats():
         1: {"games": 0, "td_wins": 0, "opp_wins": 0, "draws": 0},
         2: {"games": 0, "td_wins": 0, "opp_wins": 0, "draws": 0},
         3: {"games": 0, "td_wins": 0, "opp_wins": 0, "draws": 0},
+        4: {"games": 0, "td_wins": 0, "opp_wins": 0, "draws": 0},
     }
 
 stats = default_stats()
@@ -73,6 +149,15 @@ num_games = 0
 victorias_j1 = 0
 victorias_j2 = 0
 
+# Velocidad y decimación del dibujo (ver VELOCIDADES)
+velocidad = 0
+render_activo = True
+ultimo_dibujo = 0.0
+partidas_por_seg = 0.0
+ritmo_t0 = time.time()
+ritmo_partidas0 = 0
+persistencia_pendiente = False   # Partidas cuyo V/stats aún no se guardaron (ver VELOCIDADES)
+
 # Info de depuración / aprendizaje
 ultimo_mov_td = "-"
 valor_estado_actual = 0.0
@@ -101,33 +186,101 @@ def tablero_lleno(tablero):
     return True
 
 def verificar_ganador(tablero, pieza):
-    # Horizontal
-    for c in range(COLUMN_COUNT - 3):
-        for r in range(ROW_COUNT):
-            if all(tablero[r][c+i] == pieza for i in range(4)):
-                return [(r, c+i) for i in range(4)]
+    """Revisa todas las ventanas del tablero; devuelve la primera línea ganadora o None."""
+    completas = (tablero.ravel()[VENTANAS_IDX] == pieza).all(axis=1)
+    if completas.any():
+        return VENTANAS[int(np.argmax(completas))]
+    return None
 
-    # Vertical
-    for c in range(COLUMN_COUNT):
-        for r in range(ROW_COUNT - 3):
-            if all(tablero[r+i][c] == pieza for i in range(4)):
-                return [(r+i, c) for i in range(4)]
-
-    # Diagonal positiva
-    for c in range(COLUMN_COUNT - 3):
-        for r in range(ROW_COUNT - 3):
-            if all(tablero[r+i][c+i] == pieza for i in range(4)):
-                return [(r+i, c+i) for i in range(4)]
-
-    # Diagonal negativa
-    for c in range(COLUMN_COUNT - 3):
-        for r in range(3, ROW_COUNT):
-            if all(tablero[r-i][c+i] == pieza for i in range(4)):
-                return [(r-i, c+i) for i in range(4)]
+def ganador_tablero(tablero):
+    """Marca que tiene una línea completa, o None; una sola pasada por las ventanas para ambas piezas."""
+    ventanas = tablero.ravel()[VENTANAS_IDX]
+    completas = (ventanas[:, 0] != 0) & (ventanas == ventanas[:, :1]).all(axis=1)
+    if completas.any():
+        return int(ventanas[int(np.argmax(completas)), 0])
+    return None
 
+def verificar_ganador_desde(tablero, fila, col, pieza):
+    """Revisa solo las líneas que pasan por la última ficha colocada en (fila, col)."""
+    for dr, dc in DIRECCIONES:
+        linea = [(fila, col)]
+        for sentido in (1, -1):
+            r, c = fila + sentido*dr, col + sentido*dc
+            while 0 <= r < ROW_COUNT and 0 <= c < COLUMN_COUNT and tablero[r, c] == pieza:
+                linea.append((r, c))
+                r, c = r + sentido*dr, c + sentido*dc
+        if len(linea) >= CONNECT_N:
+            return sorted(linea)
     return None
 
+# -------- CONFIGURACIÓN DEL TABLERO --------
+
+DIRECCIONES = ((0, 1), (1, 0), (1, 1), (-1, 1))
+_ARCHIVOS_BASE = (VALUES_FILE, STATS_FILE, REPLAY_PREFIX, LOG_FILE, ENDGAME_FILE, CACHE_FILE)
+
+def calcular_ventanas():
+    """Todas las ventanas de CONNECT_N casillas, en el orden horizontal, vertical, diagonales."""
+    n = CONNECT_N
+    ventanas = []
+    for c in range(COLUMN_COUNT - n + 1):
+        for r in range(ROW_COUNT):
+            ventanas.append([(r, c+i) for i in range(n)])
+    for c in range(COLUMN_COUNT):
+        for r in range(ROW_COUNT - n + 1):
+            ventanas.append([(r+i, c) for i in range(n)])
+    for c in range(COLUMN_COUNT - n + 1):
+        for r in range(ROW_COUNT - n + 1):
+            ventanas.append([(r+i, c+i) for i in range(n)])
+    for c in range(COLUMN_COUNT - n + 1):
+        for r in range(n - 1, ROW_COUNT):
+            ventanas.append([(r-i, c+i) for i in range(n)])
+    return ventanas
+
+def configurar_tablero(filas=6, columnas=7, conecta=4):
+    """
+    Fija el tamaño del tablero y la longitud de línea, recalcula las tablas de
+    ventanas y separa los archivos persistentes de cada variante.
+    """
+    global ROW_COUNT, COLUMN_COUNT, CONNECT_N, VENTANAS, VENTANAS_IDX
+    global VALUES_FILE, STATS_FILE, REPLAY_PREFIX, LOG_FILE, ENDGAME_FILE, CACHE_FILE
+    global replay, registro, tabla_finales, firma_finales, cache_jugadas
+    if conecta < 2 or conecta > max(filas, columnas):
+        raise ValueError(f"No se puede conectar {conecta} en un tablero de {filas}x{columnas}")
+    ROW_COUNT, COLUMN_COUNT, CONNECT_N = filas, columnas, conecta
+    if _pool is not None:
+        cerrar_pool()   # Sus procesos buscan con la variante anterior
+
+    VENTANAS = calcular_ventanas()
+    VENTANAS_IDX = np.array([[r*COLUMN_COUNT + c for r, c in v] for v in VENTANAS],
+                            dtype=np.intp).reshape(len(VENTANAS), CONNECT_N)
+
+    # La variante clásica conserva los nombres de archivo originales
+    sufijo = "" if (filas, columnas, conecta) == (6, 7, 4) else f"_{filas}x{columnas}_c{conecta}"
+    valores, estadisticas, prefijo_replay, log, finales, cache = _ARCHIVOS_BASE
+    VALUES_FILE = "{0}{2}{1}".format(*os.path.splitext(valores), sufijo)
+    STATS_FILE = "{0}{2}{1}".format(*os.path.splitext(estadisticas), sufijo)
+    REPLAY_PREFIX = prefijo_replay + sufijo
+    LOG_FILE = "{0}{2}{1}".format(*os.path.splitext(log), sufijo)
+    ENDGAME_FILE = "{0}{2}{1}".format(*os.path.splitext(finales), sufijo)
+    CACHE_FILE = "{0}{2}{1}".format(*os.path.splitext(cache), sufijo)
+
+    if registro is not None:
+        registro.cerrar()
+    replay = None          # Se carga el de la variante nueva en el primer uso
+    registro = RegistroPartidas(LOG_FILE, ROW_COUNT, COLUMN_COUNT, CONNECT_N)
+    if not registro.activo:
+        print(f"El registro de partidas admite hasta {MAX_COLUMNAS_REGISTRO} columnas: "
+              f"las partidas de {filas}x{columnas} no se registran.")
+    tabla_finales = TablaFinales.cargar(ENDGAME_FILE, ROW_COUNT, COLUMN_COUNT, CONNECT_N)
+    # Se calcula una vez: len() cuenta las entradas recorriendo toda la tabla hash
+    firma_finales = 0 if tabla_finales is None else (tabla_finales.max_vacias << 32) | len(tabla_finales)
+    cache_jugadas = None   # Se carga la de la variante nueva en el primer uso
+
+configurar_tablero(ROW_COUNT, COLUMN_COUNT, CONNECT_N)
+
 def dibujar_tablero(tablero):
+    if not render_activo:
+        return
     # Fondo azul del tablero y huecos negros
     for c in range(COLUMN_COUNT):
         for r in range(ROW_COUNT):
@@ -157,6 +310,8 @@ def dibujar_tablero(tablero):
     pygame.display.update()
 
 def animar_caida(col, fila_final, color):
+    if not velocidad_actual()[2]:
+        return
     for f in range(ROW_COUNT):
         if f > fila_final:
             break
@@ -177,6 +332,39 @@ def dibujar_linea_ganadora(lista):
             RADIUS
         )
 
+# -------- VELOCIDAD Y MODO TURBO --------
+
+def velocidad_actual():
+    # Con un humano en juego siempre se usa el ritmo normal
+    return VELOCIDADES[velocidad if auto_restart else 0]
+
+def cambiar_velocidad(paso):
+    global velocidad
+    velocidad = max(0, min(len(VELOCIDADES) - 1, velocidad + paso))
+
+def esperar(ms):
+    if velocidad_actual()[1]:
+        pygame.time.wait(ms)
+
+def toca_dibujar():
+    """En turbo: dibujar cada VELOCIDADES[..][3] ms o al terminar cada N-ésima partida."""
+    global ultimo_dibujo
+    cada_ms = velocidad_actual()[3]
+    ahora = time.time()
+    if (cada_ms == 0 or (ahora - ultimo_dibujo) * 1000 >= cada_ms
+            or (game_over and num_games % TURBO_CADA_N_PARTIDAS == 0)):
+        ultimo_dibujo = ahora
+        return True
+    return False
+
+def actualizar_ritmo():
+    """Partidas por segundo de la sesión, recalculadas una vez por segundo."""
+    global partidas_por_seg, ritmo_t0, ritmo_partidas0
+    ahora = time.time()
+    if ahora - ritmo_t0 >= 1.0:
+        partidas_por_seg = (num_games - ritmo_partidas0) / (ahora - ritmo_t0)
+        ritmo_t0, ritmo_partidas0 = ahora, num_games
+
 # -------- TABLEROS INICIALES ALEATORIOS --------
 
 def generar_tablero_partida_real():
@@ -187,7 +375,7 @@ def generar_tablero_partida_real():
     while True:
         t = crear_tablero()
 
-        jugadas_previas = random.randint(0, ROW_COUNT * COLUMN_COUNT - 12)
+        jugadas_previas = random.randint(0, max(0, ROW_COUNT * COLUMN_COUNT - 12))
         jugador = random.choice([J1, J2])
         turnos = []
 
@@ -203,7 +391,7 @@ def generar_tablero_partida_real():
             fila = siguiente_fila_vacia(t, col)
             soltar_pieza(t, fila, col, pieza)
 
-            if verificar_ganador(t, J1) or verificar_ganador(t, J2):
+            if verificar_ganador_desde(t, fila, col, pieza):
                 break
 
         else:
@@ -230,76 +418,69 @@ def dibujar_degradado_vertical(surface, rect, c1, c2):
 def get_valid_locations(tablero):
     return [c for c in range(COLUMN_COUNT) if movimiento_valido(tablero, c)]
 
-def is_terminal(tablero):
-    return (
-        verificar_ganador(tablero, J1) is not None
-        or verificar_ganador(tablero, J2) is not None
-        or tablero_lleno(tablero)
-    )
-
-def evaluar_ventana(v, pieza):
-    puntuacion = 0
-    oponente = J1 if pieza == J2 else J2
-
-    if v.count(pieza) == 4: puntuacion += 100
-    elif v.count(pieza) == 3 and v.count(0) == 1: puntuacion += 10
-    elif v.count(pieza) == 2 and v.count(0) == 2: puntuacion += 4
-
-    if v.count(oponente) == 3 and v.count(0) == 1:
-        puntuacion -= 8
-
-    return puntuacion
-
 def score_position(tablero, pieza):
-    score = 0
-    center = [int(i) for i in list(tablero[:, COLUMN_COUNT//2])]
-    score += center.count(pieza) * 6
-
-    # Horizontal
-    for r in range(ROW_COUNT):
-        row = [int(i) for i in tablero[r, :]]
-        for c in range(COLUMN_COUNT - 3):
-            score += evaluar_ventana(row[c:c+4], pieza)
-
-    # Vertical
-    for c in range(COLUMN_COUNT):
-        col = [int(i) for i in tablero[:, c]]
-        for r in range(ROW_COUNT - 3):
-            score += evaluar_ventana(col[r:r+4], pieza)
-
-    # Diagonal positiva
-    for r in range(ROW_COUNT - 3):
-        for c in range(COLUMN_COUNT - 3):
-            score += evaluar_ventana([tablero[r+i][c+i] for i in range(4)], pieza)
-
-    # Diagonal negativa
-    for r in range(3, ROW_COUNT):
-        for c in range(COLUMN_COUNT - 3):
-            score += evaluar_ventana([tablero[r-i][c+i] for i in range(4)], pieza)
-
+    """Heurística sobre la tabla de ventanas precalculada (VENTANAS_IDX), sin bucles en Python."""
+    n = CONNECT_N
+    ventanas = tablero.ravel()[VENTANAS_IDX]
+    propias = (ventanas == pieza).sum(axis=1)
+    vacias = (ventanas == 0).sum(axis=1)
+    rivales = n - propias - vacias
+
+    score = int(np.count_nonzero(tablero[:, COLUMN_COUNT//2] == pieza)) * 6
+    score += 100 * int(np.count_nonzero(propias == n))
+    score += 10 * int(np.count_nonzero((propias == n-1) & (vacias == 1)))
+    score += 4 * int(np.count_nonzero((propias == n-2) & (vacias == 2)))
+    score -= 8 * int(np.count_nonzero((rivales == n-1) & (vacias == 1)))
     return score
 
-def minimax(tablero, depth, alpha, beta, maximizing, pieza_max):
+def valor_final_minimax(exacto):
+    """Pasa un valor de la tabla de finales a la escala de minimax; por debajo de una victoria inmediata."""
+    if exacto == 0:
+        return 0
+    magnitud = 1_000_000 - (ROW_COUNT * COLUMN_COUNT + 1 - abs(exacto))
+    return magnitud if exacto > 0 else -magnitud
+
+def minimax(tablero, depth, alpha, beta, maximizing, pieza_max, ultima=None):
+    """
+    ultima = (fila, col) de la jugada que llevó a este tablero; si se conoce,
+    solo se revisan las líneas que pasan por esa ficha. Sin ella (llamada
+    directa, nunca desde la recursión ni desde minimax_raiz) se revisa todo el
+    tablero una vez.
+    """
     valid = get_valid_locations(tablero)
-    terminal = is_terminal(tablero)
+    if ultima is None:
+        ganador = ganador_tablero(tablero)
+    else:
+        fila, col = ultima
+        pieza = tablero[fila, col]
+        ganador = pieza if verificar_ganador_desde(tablero, fila, col, pieza) else None
+    terminal = ganador is not None or not valid
+
+    # Final exacto desde la tabla (no en la raíz, que debe devolver una columna)
+    if not terminal and ultima is not None and tabla_finales is not None:
+        mover = pieza_max if maximizing else (J1 if pieza_max == J2 else J2)
+        exacto = tabla_finales.consultar(tablero, mover)
+        if exacto is not None:
+            valor = valor_final_minimax(exacto)
+            return (None, valor if maximizing else -valor)
 
     if depth == 0 or terminal:
         if terminal:
-            if verificar_ganador(tablero, pieza_max):
+            if ganador == pieza_max:
                 return (None, 1_000_000)
-            elif verificar_ganador(tablero, J1 if pieza_max == J2 else J2):
+            elif ganador is not None:
                 return (None, -1_000_000)
             return (None, 0)
         return (None, score_position(tablero, pieza_max))
 
     if maximizing:
         value = -math.inf
-        best_col = random.choice(valid)
+        best_col = valid[0]
         for col in valid:
             fila = siguiente_fila_vacia(tablero, col)
             copia = tablero.copy()
             soltar_pieza(copia, fila, col, pieza_max)
-            new_score = minimax(copia, depth-1, alpha, beta, False, pieza_max)[1]
+            new_score = minimax(copia, depth-1, alpha, beta, False, pieza_max, (fila, col))[1]
             if new_score > value:
                 value = new_score
                 best_col = col
@@ -310,12 +491,12 @@ def minimax(tablero, depth, alpha, beta, maximizing, pieza_max):
     else:
         value = math.inf
         pieza_min = J1 if pieza_max == J2 else J2
-        best_col = random.choice(valid)
+        best_col = valid[0]
         for col in valid:
             fila = siguiente_fila_vacia(tablero, col)
             copia = tablero.copy()
             soltar_pieza(copia, fila, col, pieza_min)
-            new_score = minimax(copia, depth-1, alpha, beta, True, pieza_max)[1]
+            new_score = minimax(copia, depth-1, alpha, beta, True, pieza_max, (fila, col))[1]
             if new_score < value:
                 value = new_score
                 best_col = col
@@ -324,22 +505,169 @@ def minimax(tablero, depth, alpha, beta, maximizing, pieza_max):
                 break
         return best_col, value
 
+# -------- MINIMAX PARALELO (RAÍZ) --------
+
+def obtener_pool():
+    """Pool de MINIMAX_WORKERS procesos; la GUI lo crea antes del bucle principal (arrancarlo tarda)."""
+    global _pool, _mejor_raiz
+    if _pool is None and MINIMAX_WORKERS > 1:
+        # spawn: los procesos hijos no heredan el estado de pygame, pero tampoco
+        # la variante del tablero, así que cada uno la configura al arrancar
+        contexto = multiprocessing.get_context("spawn")
+        _mejor_raiz = contexto.Value("d", -math.inf)
+        _pool = contexto.Pool(MINIMAX_WORKERS, initializer=_iniciar_proceso_minimax,
+                              initargs=(ROW_COUNT, COLUMN_COUNT, CONNECT_N, _mejor_raiz))
+    return _pool
+
+def _iniciar_proceso_minimax(filas, columnas, conecta, mejor_raiz):
+    global _mejor_raiz
+    configurar_tablero(filas, columnas, conecta)
+    _mejor_raiz = mejor_raiz
+
+def cerrar_pool():
+    global _pool
+    if _pool is not None:
+        _pool.terminate()
+        _pool = None
+
+def _valor_hijo(tablero, depth, alpha, pieza_max, ultima):
+    return minimax(tablero, depth, alpha, math.inf, False, pieza_max, ultima)[1]
+
+def _valor_hijo_compartido(tablero, depth, pieza_max, ultima):
+    """En un proceso del pool: busca un hijo con alpha = (mejor valor de la raíz hasta ahora) - 1 y lo actualiza."""
+    valor = _valor_hijo(tablero, depth, _mejor_raiz.value - 1, pieza_max, ultima)
+    with _mejor_raiz.get_lock():
+        if valor > _mejor_raiz.value:
+            _mejor_raiz.value = valor
+    return valor
+
+def minimax_raiz(tablero, depth, pieza_max, pool=None):
+    """
+    Busca cada jugada raíz con alpha = (mejor valor hasta ahora) - 1: así las
+    que empatan con la mejor tienen valor exacto y se devuelven todas, para
+    desempatar al azar. Devuelve (columnas empatadas, valor). Con pool cada
+    hijo es una tarea, de la columna central hacia afuera, y el mejor valor se
+    comparte entre procesos: cada tarea arranca con el mejor que ya se conoce.
+    """
+    valid = get_valid_locations(tablero)
+    if not valid:
+        return [], 0
+    depth = max(depth, 1)
+
+    hijos = []
+    for col in valid:
+        fila = siguiente_fila_vacia(tablero, col)
+        copia = tablero.copy()
+        soltar_pieza(copia, fila, col, pieza_max)
+        hijos.append((copia, (fila, col)))
+
+    if pool is None or depth <= 1 or len(valid) < 2:
+        valores = []
+        for copia, ultima in hijos:
+            valores.append(_valor_hijo(copia, depth-1, max(valores, default=-math.inf) - 1, pieza_max, ultima))
+    else:
+        orden = sorted(range(len(hijos)), key=lambda i: abs(valid[i] - (COLUMN_COUNT - 1) / 2))
+        _mejor_raiz.value = -math.inf
+        # chunksize=1: cada proceso toma el siguiente hijo al quedar libre, con el alpha de ese momento
+        resultados = pool.starmap(_valor_hijo_compartido,
+                                  [(hijos[i][0], depth-1, pieza_max, hijos[i][1]) for i in orden], chunksize=1)
+        valores = [0] * len(hijos)
+        for i, v in zip(orden, resultados):
+            valores[i] = v
+    mejor = max(valores)
+    return [col for col, v in zip(valid, valores) if v == mejor], mejor
+
+# -------- CACHE DE JUGADAS MINIMAX --------
+
+def ruta_cache():
+    """Un archivo por profundidad: la misma posición puede tener otra jugada a otra profundidad."""
+    base, ext = os.path.splitext(CACHE_FILE)
+    return f"{base}_d{MAX_DEPTH}{ext}"
+
+def cache_minimax():
+    """Cache de la variante y profundidad actuales; se rehace (cargando su archivo) si cambiaron."""
+    global cache_jugadas
+    if not CACHE_CAPACIDAD:
+        return None
+    if (cache_jugadas is None or cache_jugadas.profundidad != MAX_DEPTH or cache_jugadas.firma != firma_finales
+            or (cache_jugadas.bb.filas, cache_jugadas.bb.columnas, cache_jugadas.bb.conecta)
+            != (ROW_COUNT, COLUMN_COUNT, CONNECT_N)):
+        try:
+            cache_jugadas = CacheJugadas(ROW_COUNT, COLUMN_COUNT, CONNECT_N, MAX_DEPTH,
+                                         CACHE_CAPACIDAD, firma_finales).cargar(ruta_cache())
+        except ValueError:
+            return None   # Tablero demasiado grande para claves de 64 bits
+    return cache_jugadas
+
+def guardar_cache():
+    if cache_jugadas is not None and cache_jugadas.profundidad == MAX_DEPTH:
+        cache_jugadas.guardar(ruta_cache())
+
+def jugada_minimax(tablero, pieza):
+    """Columna de la IA Minimax a MAX_DEPTH: de la cache si la posición ya se buscó, si no se busca y se guarda."""
+    cache = cache_minimax()
+    if cache is not None:
+        clave = cache.clave(tablero, pieza)
+        empatadas = cache.consultar(clave)
+        if empatadas is not None:
+            telemetria.contar("cache_minimax_aciertos")
+            return random.choice(empatadas)
+        telemetria.contar("cache_minimax_fallos")
+
+    with telemetria.cronometro("busqueda_minimax_seg"):
+        empatadas, _ = minimax_raiz(tablero, MAX_DEPTH, pieza, obtener_pool())
+    telemetria.contar("busquedas_minimax")
+    if cache is not None and empatadas:
+        cache.guardar_jugadas(clave, empatadas)
+    return random.choice(empatadas) if empatadas else None
+
 # -------- PERSISTENCIA TD & STATS --------
 
+def publicador_valores():
+    """Publicador de la tabla V; se rehace si VALUES_FILE cambió (otra variante u otra ruta)."""
+    global publicador
+    if publicador is None or publicador.ruta != VALUES_FILE:
+        if publicador is not None:
+            publicador.liberar()
+        publicador = PublicadorValores(VALUES_FILE)
+    return publicador
+
 def cargar_valores():
     global V
-    if os.path.exists(VALUES_FILE):
-        try:
-            with open(VALUES_FILE, "rb") as f:
-                V = pickle.load(f)
-        except Exception:
-            V = {}
-    else:
-        V = {}
+    V, _ = publicador_valores().cargar()
 
 def guardar_valores():
-    with open(VALUES_FILE, "wb") as f:
-        pickle.dump(V, f)
+    # Solo escribe si este proceso es el escritor y tiene la última versión
+    with telemetria.cronometro("persistencia_valores_seg"):
+        return publicador_valores().publicar(V)
+
+def tomar_escritura_valores():
+    """Para entrenar: toma el lock aunque lo tenga otro proceso, partiendo de su última versión."""
+    global V
+    pub = publicador_valores()
+    pub.adquirir_escritura(forzar=True)
+    # Se carga después de tomar el lock: el escritor anterior pudo publicar hasta ese momento
+    if pub.version < pub.leer_version():
+        V, _ = pub.cargar()
+
+def pasar_a_solo_lectura():
+    """
+    Otro proceso tomó la escritura de V (o publicó una versión que aquí no se
+    cargó): lo que se aprenda en este proceso ya no se podría publicar, así que
+    se deja de entrenar y V solo sigue las versiones del escritor.
+    """
+    global v_solo_lectura
+    if not v_solo_lectura:
+        v_solo_lectura = True
+        telemetria.contar("v_escritura_perdida")
+        print(f"Otro proceso escribe {VALUES_FILE}: este deja de entrenar y solo lee V.")
+
+def sincronizar_valores():
+    """Se llama en cada frame: si otro proceso publicó una versión nueva de V, la adopta."""
+    global V
+    nuevo = publicador_valores().revisar()
+    if nuevo is not None:
+        V = nuevo
 
 def cargar_stats():
     global stats
@@ -351,14 +679,41 @@ def cargar_stats():
             stats = default_stats()
     else:
         stats = default_stats()
+    # Archivos anteriores a los modos nuevos
+    for modo, m in default_stats().items():
+        stats.setdefault(modo, m)
 
 def guardar_stats():
-    with open(STATS_FILE, "wb") as f:
-        pickle.dump(stats, f)
-
-def registrar_resultado_stats(winner_mark):
+    with telemetria.cronometro("persistencia_stats_seg"):
+        with open(STATS_FILE, "wb") as f:
+            pickle.dump(stats, f)
+
+def bytes_tabla_valores():
+    """Estimación del tamaño de V: el dict más cada clave y su float (todas las claves miden igual)."""
+    if not V:
+        return sys.getsizeof(V)
+    key = next(iter(V))
+    return sys.getsizeof(V) + len(V) * (sys.getsizeof(key) + sys.getsizeof(0.0))
+
+def rss_max_bytes():
+    if resource is None:
+        return 0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024   # Linux lo da en KiB
+
+telemetria.medir_con("v_estados", lambda: len(V))
+telemetria.medir_con("v_bytes_estimados", bytes_tabla_valores)
+telemetria.medir_con("v_version", lambda: publicador_valores().version)
+telemetria.medir_con("v_solo_lectura", lambda: int(v_solo_lectura))
+telemetria.medir_con("finales_aciertos", lambda: tabla_finales.aciertos if tabla_finales is not None else 0)
+telemetria.medir_con("finales_fallos", lambda: tabla_finales.fallos if tabla_finales is not None else 0)
+telemetria.medir_con("replay_transiciones", lambda: len(replay) if replay is not None else 0)
+telemetria.medir_con("proceso_rss_max_bytes", rss_max_bytes)
+telemetria.medir_con("cache_minimax_entradas", lambda: len(cache_jugadas) if cache_jugadas is not None else 0)
+
+def registrar_resultado_stats(winner_mark, guardar=True):
     """Actualiza estadísticas globales persistentes."""
-    if game_mode not in (1,2,3):
+    if game_mode not in (1,2,3,4):
         return
     stats["total_games"] += 1
     m = stats[game_mode]
@@ -373,7 +728,8 @@ def registrar_resultado_stats(winner_mark):
         else:
             m["opp_wins"] += 1
 
-    guardar_stats()
+    if guardar:
+        guardar_stats()
 
 # -------- TD LEARNING (APRENDIZ) --------
 
@@ -382,13 +738,95 @@ def get_state_key(tablero, mark):
     flat = tablero.flatten().astype(int)
     return "".join(map(str, flat)) + f"_{mark}"
 
-def actualizar_td(reward):
+def actualizar_td(reward, guardar=True):
     global episode_states, V
     for key in episode_states:
+        if key not in V:
+            telemetria.contar("td_estados_nuevos")
         old = V.get(key, 0.0)
-        V[key] = old + ALPHA * (reward - old)
+        delta = ALPHA * (reward - old)
+        V[key] = old + delta
+        telemetria.observar("td_delta_abs", abs(delta), BUCKETS_MAGNITUD)
+    telemetria.contar("td_actualizaciones", len(episode_states))
     episode_states = []
-    guardar_valores()
+    if guardar and not guardar_valores():
+        pasar_a_solo_lectura()
+
+def objetivo_exacto(estado, siguiente, marca):
+    """
+    Valor exacto (+1, 0, -1 para el aprendiz) del estado siguiente si está en la
+    tabla de finales. Quién mueve en él se deduce de quién puso la última ficha.
+    """
+    if tabla_finales is None:
+        return None
+    n = ROW_COUNT * COLUMN_COUNT
+    planos_sig = np.unpackbits(siguiente, count=2 * n)
+    vacias = n - int(planos_sig.sum())
+    if vacias > tabla_finales.max_vacias:
+        return None
+    planos = np.unpackbits(estado, count=2 * n)
+    plano_marca = slice(0, n) if marca == J1 else slice(n, 2 * n)
+    if planos_sig[plano_marca].sum() > planos[plano_marca].sum():
+        mover = J1 if marca == J2 else J2
+    else:
+        mover = int(marca)
+    celdas = (planos_sig[:n] + 2 * planos_sig[n:]).reshape(ROW_COUNT, COLUMN_COUNT)
+    exacto = tabla_finales.consultar(celdas, mover, vacias)
+    if exacto is None:
+        return None
+    signo = (exacto > 0) - (exacto < 0)
+    return float(signo if mover == marca else -signo)
+
+def entrenar_desde_replay(buffer, lotes, tam_lote, priorizado=False):
+    """Actualizaciones TD(0) sobre minilotes del buffer: V(s) += ALPHA * (r + V(s') - V(s))."""
+    for _ in range(lotes):
+        lote = buffer.muestrear(tam_lote, priorizado)
+        if lote is None:
+            return
+        idx, estados, siguientes, marcas, recompensas, terminales = lote
+        errores = np.empty(len(idx), dtype=np.float32)
+        for i in range(len(idx)):
+            key = buffer.clave(estados[i], marcas[i])
+            objetivo = float(recompensas[i])
+            if not terminales[i]:
+                exacto = objetivo_exacto(estados[i], siguientes[i], marcas[i])
+                if exacto is not None:
+                    objetivo += exacto
+                else:
+                    objetivo += V.get(buffer.clave(siguientes[i], marcas[i]), 0.0)
+            old = V.get(key, 0.0)
+            error = objetivo - old
+            errores[i] = error
+            # float de Python: un escalar de NumPy en V ocupa ~4 veces más en el pickle
+            V[key] = float(old + ALPHA * error)
+        buffer.actualizar_prioridades(idx, errores)
+        telemetria.contar("replay_actualizaciones", len(idx))
+        telemetria.observar("replay_error_td_abs", float(np.abs(errores).mean()), BUCKETS_MAGNITUD)
+        telemetria.exportar_si_toca()   # El entrenamiento offline no pasa por el bucle de la GUI
+
+def buffer_replay():
+    """Buffer de la variante actual; se carga de disco en el primer uso (los procesos de Minimax no lo usan)."""
+    global replay
+    if replay is None:
+        replay = ReplayBuffer.cargar(REPLAY_PREFIX, REPLAY_CAPACITY, ROW_COUNT * COLUMN_COUNT)
+    return replay
+
+def guardar_replay():
+    if replay is not None:
+        replay.guardar(REPLAY_PREFIX)
+
+def cerrar_sesion():
+    """Persistencia pendiente antes de salir: V y stats, buffer de replay, registro de partidas y cache de Minimax."""
+    if persistencia_pendiente:
+        guardar_stats()
+        if not v_solo_lectura:
+            guardar_valores()
+    guardar_replay()
+    guardar_cache()
+    registro.cerrar()
+    cerrar_pool()
+    publicador_valores().liberar()
+    telemetria.exportar()
 
 def td_elegir_movimiento(tablero, mark, epsilon):
     """Devuelve (columna, tipo_movimiento) donde tipo_movimiento es 'exploración' o 'explotación'."""
@@ -422,9 +860,12 @@ def td_elegir_movimiento(tablero, mark, epsilon):
 # -------- GESTIÓN DE MODOS Y PARTIDAS --------
 
 def configurar_modo(modo):
-    global game_mode, player_roles, apprentice_mark, auto_restart, num_games
+    global game_mode, player_roles, apprentice_mark, auto_restart, num_games, agente_mcts
+    global ritmo_partidas0, v_solo_lectura
     game_mode = modo
+    v_solo_lectura = False   # Se vuelve a intentar publicar con el modo nuevo
     num_games = 0
+    ritmo_partidas0 = 0
     if modo == 1:
         # IA Aprendiz (amarillo) vs Humano (rojo)
         player_roles = {J1: ROLE_HUMANO, J2: ROLE_TD}
@@ -440,12 +881,23 @@ def configurar_modo(modo):
         player_roles = {J1: ROLE_TD, J2: ROLE_MINIMAX_SEMI}
         apprentice_mark = J1
         auto_restart = True
+    elif modo == 4:
+        # IA Aprendiz (rojo) vs IA MCTS (amarillo)
+        player_roles = {J1: ROLE_TD, J2: ROLE_MCTS}
+        apprentice_mark = J1
+        auto_restart = True
+        agente_mcts = MCTS(ROW_COUNT, COLUMN_COUNT, CONNECT_N, MCTS_TIEMPO_MS,
+                           MCTS_MAX_PLAYOUTS, playout_heuristico=MCTS_PLAYOUT_HEURISTICO)
+    if auto_restart:
+        # Los modos de entrenamiento son los escritores de V
+        tomar_escritura_valores()
 
 def nueva_partida():
     global tablero, turno, posiciones_ganadoras, game_over, episode_states
     global ultimo_mov_td, valor_estado_actual, epsilon_actual
     episode_states = []
     tablero, turno = generar_tablero_partida_real()
+    registro.iniciar(tablero, turno, player_roles, game_mode)
     posiciones_ganadoras = None
     game_over = False
     ultimo_mov_td = "-"
@@ -465,14 +917,19 @@ def obtener_texto_ganador(winner_mark):
         return "Gana la IA Perfecta"
     elif role == ROLE_MINIMAX_SEMI:
         return "Gana la IA Semiperfecta"
+    elif role == ROLE_MCTS:
+        return "Gana la IA MCTS"
     else:
         return "Gana alguien"
 
 def fin_partida(winner_mark):
     global game_over, ultimo_ganador, victorias_j1, victorias_j2, ganador_texto, num_games
+    global persistencia_pendiente
     game_over = True
     ultimo_ganador = winner_mark
     num_games += 1
+    # En turbo pickle de V y stats cada N partidas: en cada una limitaba las partidas/s
+    guardar = num_games % velocidad_actual()[4] == 0
 
     if winner_mark == J1:
         victorias_j1 += 1
@@ -487,23 +944,71 @@ def fin_partida(winner_mark):
             reward = 1.0
         else:
             reward = -1.0
-        if episode_states:
-            actualizar_td(reward)
-
-    registrar_resultado_stats(winner_mark)
+        if episode_states and not v_solo_lectura:
+            buffer_replay().agregar_episodio(episode_states, reward)
+            if REPLAY_LOTES_POR_PARTIDA > 0:
+                entrenar_desde_replay(replay, REPLAY_LOTES_POR_PARTIDA, REPLAY_TAM_LOTE, REPLAY_PRIORIZADO)
+            actualizar_td(reward, guardar)
+
+    registrar_resultado_stats(winner_mark, guardar)
+    persistencia_pendiente = not guardar
+    registro.terminar(winner_mark)
+    telemetria.contar("partidas")
+    if auto_restart and num_games % CACHE_GUARDAR_CADA == 0:
+        guardar_cache()
     ganador_texto = obtener_texto_ganador(winner_mark)
 
+# -------- PARTIDAS SIN GUI --------
+
+def jugar_partida_sin_gui(rol_rival, epsilon, aprender=True):
+    """
+    Una partida completa de la IA Aprendiz (J1) contra ROLE_MINIMAX_PERF o
+    ROLE_MINIMAX_SEMI, con las mismas reglas que los modos 2 y 3 pero sin
+    dibujar ni tocar stats, registro ni archivos (salvo la telemetría, que se
+    exporta como en el bucle de la GUI). Devuelve la marca ganadora o None.
+    """
+    global episode_states
+    episode_states = []
+    tablero, turno = generar_tablero_partida_real()
+    while True:
+        if turno == J1:
+            episode_states.append(get_state_key(tablero, J1))
+            col, _ = td_elegir_movimiento(tablero, J1, epsilon)
+        elif rol_rival == ROLE_MINIMAX_SEMI and random.random() < ERROR_PROB:
+            col = random.choice(get_valid_locations(tablero))
+        else:
+            col = jugada_minimax(tablero, turno)
+
+        fila = siguiente_fila_vacia(tablero, col)
+        soltar_pieza(tablero, fila, col, turno)
+        if verificar_ganador_desde(tablero, fila, col, turno):
+            ganador = turno
+            break
+        if tablero_lleno(tablero):
+            ganador = None
+            break
+        turno = J1 if turno == J2 else J2
+
+    if aprender and episode_states:
+        reward = 0.0 if ganador is None else (1.0 if ganador == J1 else -1.0)
+        actualizar_td(reward, guardar=False)
+    episode_states = []
+    telemetria.contar("partidas")
+    telemetria.exportar_si_toca()
+    return ganador
+
 # -------- MENÚ PRINCIPAL --------
 
 def dibujar_menu():
     screen.fill(NEGRO)
-    titulo = fuente.render("Conecta 4 - Menú Principal", True, BLANCO)
+    titulo = fuente.render(f"Conecta {CONNECT_N} - Menú Principal", True, BLANCO)
     screen.blit(titulo, (width//2 - titulo.get_width()//2, 60))
 
     opciones = [
         "1) IA Aprendiz vs Humano",
         "2) IA Aprendiz vs IA Perfecta (Minimax)",
         "3) IA Aprendiz vs IA Semiperfecta (Minimax Aleatoria)",
+        "4) IA Aprendiz vs IA MCTS (Monte Carlo)",
         "ESC) Salir"
     ]
     for i, txt in enumerate(opciones):
@@ -516,7 +1021,7 @@ def dibujar_menu():
     screen.blit(fuente_small.render("Estadísticas globales:", True, BLANCO), (x_stats, y0-30))
     screen.blit(fuente_small.render(f"Total partidas: {stats['total_games']}", True, BLANCO), (x_stats, y0))
 
-    for modo in (1,2,3):
+    for modo in (1,2,3,4):
         m = stats[modo]
         txt = f"Modo {modo} - Partidas: {m['games']} | TD gana: {m['td_wins']} | Rival: {m['opp_wins']} | Emp: {m['draws']}"
         screen.blit(fuente_small.render(txt, True, BLANCO), (x_stats, y0 + 30*modo))
@@ -525,210 +1030,266 @@ def dibujar_menu():
 
 # -------- INIT PYGAME --------
 
-pygame.init()
-width = COLUMN_COUNT * SQUARESIZE + 400
-height = (ROW_COUNT + 1) * SQUARESIZE
-screen = pygame.display.set_mode((width, height))
-pygame.display.setCaption = pygame.display.set_caption("Conecta 4 - TD Learning")
-
-fuente = pygame.font.SysFont("arial", 45, bold=True)
-fuente_small = pygame.font.SysFont("arial", 22, bold=False)
-
-# Cargar valores TD y estadísticas persistentes
-cargar_valores()
-cargar_stats()
-
-# Estado inicial: menú
-state = "menu"
-tablero = crear_tablero()
-turno = J1
-posiciones_ganadoras = None
-game_over = False
-columna_actual = COLUMN_COUNT // 2
-
-role_labels = {
-    ROLE_HUMANO: "Humano",
-    ROLE_TD: "Aprendiz",
-    ROLE_MINIMAX_PERF: "IA Perfecta",
-    ROLE_MINIMAX_SEMI: "IA Semiperfecta"
-}
-mode_labels = {
-    1: "Aprendiz vs Humano",
-    2: "Aprendiz vs IA Perfecta",
-    3: "Aprendiz vs IA Semiperfecta"
-}
-
-# -------- LOOP PRINCIPAL --------
-
-while True:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            sys.exit()
-
-        if state == "menu":
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_1:
-                    configurar_modo(1)
-                    nueva_partida()
-                    state = "game"
-                elif event.key == pygame.K_2:
-                    configurar_modo(2)
-                    nueva_partida()
-                    state = "game"
-                elif event.key == pygame.K_3:
-                    configurar_modo(3)
-                    nueva_partida()
-                    state = "game"
-                elif event.key == pygame.K_ESCAPE:
-                    sys.exit()
-
-        elif state == "game":
-            # Movimiento del humano (si le toca)
-            if event.type == pygame.KEYDOWN and not game_over and player_roles.get(turno) == ROLE_HUMANO:
-                if event.key == pygame.K_LEFT:
-                    columna_actual = max(0, columna_actual - 1)
-                elif event.key == pygame.K_RIGHT:
-                    columna_actual = min(COLUMN_COUNT - 1, columna_actual + 1)
-                elif event.key == pygame.K_SPACE:
-                    if movimiento_valido(tablero, columna_actual):
-                        fila = siguiente_fila_vacia(tablero, columna_actual)
-                        animar_caida(columna_actual, fila, ROJO)
-                        soltar_pieza(tablero, fila, columna_actual, J1)
-
-                        gan = verificar_ganador(tablero, J1)
-                        if gan:
-                            posiciones_ganadoras = gan
-                            fin_partida(J1)
-                        elif tablero_lleno(tablero):
-                            fin_partida(None)
-                        else:
-                            turno = J2
-
-                        dibujar_tablero(tablero)
-                        if game_over and not auto_restart:
-                            continue
-
-            # Reinicio en modo humano (espacio)
-            if event.type == pygame.KEYDOWN and game_mode == 1 and game_over:
-                if event.key == pygame.K_SPACE:
-                    nueva_partida()
-
-    # LÓGICA FUERA DE EVENTOS
-    if state == "menu":
-        dibujar_menu()
-        continue
-
-    # Si estamos en juego:
-    if state == "game":
-        # Turno IA Aprendiz (TD)
-        if not game_over and player_roles.get(turno) == ROLE_TD:
-            pygame.time.wait(120)
-            # Registrar estado actual para TD
-            key = get_state_key(tablero, apprentice_mark)
-            episode_states.append(key)
-
-            epsilon = EPSILON_TRAIN if game_mode in (2, 3) else EPSILON_HUMAN
-            col, tipo = td_elegir_movimiento(tablero, apprentice_mark, epsilon)
-            if col is not None and movimiento_valido(tablero, col):
-                fila = siguiente_fila_vacia(tablero, col)
-                color = ROJO if apprentice_mark == J1 else AMARILLO
-                animar_caida(col, fila, color)
-                soltar_pieza(tablero, fila, col, apprentice_mark)
-
-                # Info de depuración
-                ultimo_mov_td = tipo
-                epsilon_actual = epsilon
-                key2 = get_state_key(tablero, apprentice_mark)
-                valor_estado_actual = V.get(key2, 0.0)
-                episode_states.append(key2)
-
-                gan = verificar_ganador(tablero, apprentice_mark)
-                if gan:
-                    posiciones_ganadoras = gan
-                    fin_partida(apprentice_mark)
-                elif tablero_lleno(tablero):
-                    fin_partida(None)
-                else:
-                    turno = J1 if apprentice_mark == J2 else J2
+if __name__ == "__main__":
+    # Uso: python connect_4_ia.py [filas columnas [conecta]]
+    if len(sys.argv) > 2:
+        configurar_tablero(int(sys.argv[1]), int(sys.argv[2]),
+                           int(sys.argv[3]) if len(sys.argv) > 3 else CONNECT_N)
+
+    pygame.init()
+    # Reducir la casilla si el tablero configurado no cabe en la pantalla
+    info = pygame.display.Info()
+    if info.current_w > 0 and info.current_h > 0:
+        SQUARESIZE = max(30, min(SQUARESIZE,
+                                 (info.current_h - 80) // (ROW_COUNT + 1),
+                                 (info.current_w - 400) // COLUMN_COUNT))
+    RADIUS = int(SQUARESIZE / 2 - 8)
+    width = COLUMN_COUNT * SQUARESIZE + 400
+    height = (ROW_COUNT + 1) * SQUARESIZE
+    screen = pygame.display.set_mode((width, height))
+    pygame.display.setCaption = pygame.display.set_caption(f"Conecta {CONNECT_N} - TD Learning")
+
+    fuente = pygame.font.SysFont("arial", 45, bold=True)
+    fuente_small = pygame.font.SysFont("arial", 22, bold=False)
+
+    # Cargar valores TD y estadísticas persistentes
+    cargar_valores()
+    cargar_stats()
+    buffer_replay()
+    obtener_pool()   # Aquí y no en la primera jugada: arrancar los procesos congelaría la GUI
+
+    # Estado inicial: menú
+    state = "menu"
+    tablero = crear_tablero()
+    turno = J1
+    posiciones_ganadoras = None
+    game_over = False
+    columna_actual = COLUMN_COUNT // 2
+
+    role_labels = {
+        ROLE_HUMANO: "Humano",
+        ROLE_TD: "Aprendiz",
+        ROLE_MINIMAX_PERF: "IA Perfecta",
+        ROLE_MINIMAX_SEMI: "IA Semiperfecta",
+        ROLE_MCTS: "IA MCTS"
+    }
+    mode_labels = {
+        1: "Aprendiz vs Humano",
+        2: "Aprendiz vs IA Perfecta",
+        3: "Aprendiz vs IA Semiperfecta",
+        4: "Aprendiz vs IA MCTS"
+    }
 
-                dibujar_tablero(tablero)
+    # -------- LOOP PRINCIPAL --------
 
-        # Turno IA Minimax (perfecta o semiperfecta)
-        if not game_over and player_roles.get(turno) in (ROLE_MINIMAX_PERF, ROLE_MINIMAX_SEMI):
-            pygame.time.wait(120)
-            pieza_max = turno
-            valid_moves = get_valid_locations(tablero)
+    while True:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                cerrar_sesion()
+                sys.exit()
+
+            if state == "menu":
+                if event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_1:
+                        configurar_modo(1)
+                        nueva_partida()
+                        state = "game"
+                    elif event.key == pygame.K_2:
+                        configurar_modo(2)
+                        nueva_partida()
+                        state = "game"
+                    elif event.key == pygame.K_3:
+                        configurar_modo(3)
+                        nueva_partida()
+                        state = "game"
+                    elif event.key == pygame.K_4:
+                        configurar_modo(4)
+                        nueva_partida()
+                        state = "game"
+                    elif event.key == pygame.K_ESCAPE:
+                        cerrar_sesion()
+                        sys.exit()
+
+            elif state == "game":
+                # Movimiento del humano (si le toca)
+                if event.type == pygame.KEYDOWN and not game_over and player_roles.get(turno) == ROLE_HUMANO:
+                    if event.key == pygame.K_LEFT:
+                        columna_actual = max(0, columna_actual - 1)
+                    elif event.key == pygame.K_RIGHT:
+                        columna_actual = min(COLUMN_COUNT - 1, columna_actual + 1)
+                    elif event.key == pygame.K_SPACE:
+                        if movimiento_valido(tablero, columna_actual):
+                            fila = siguiente_fila_vacia(tablero, columna_actual)
+                            animar_caida(columna_actual, fila, ROJO)
+                            soltar_pieza(tablero, fila, columna_actual, J1)
+                            registro.jugada(columna_actual)
+
+                            gan = verificar_ganador_desde(tablero, fila, columna_actual, J1)
+                            if gan:
+                                posiciones_ganadoras = gan
+                                fin_partida(J1)
+                            elif tablero_lleno(tablero):
+                                fin_partida(None)
+                            else:
+                                turno = J2
+
+                            dibujar_tablero(tablero)
+                            if game_over and not auto_restart:
+                                continue
+
+                # Reinicio en modo humano (espacio)
+                if event.type == pygame.KEYDOWN and game_mode == 1 and game_over:
+                    if event.key == pygame.K_SPACE:
+                        nueva_partida()
+
+                # Velocidad (solo afecta a los modos IA vs IA)
+                if event.type == pygame.KEYDOWN:
+                    if event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+                        cambiar_velocidad(1)
+                    elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                        cambiar_velocidad(-1)
+
+        # LÓGICA FUERA DE EVENTOS
+        sincronizar_valores()
+        telemetria.exportar_si_toca()
 
-            if player_roles[turno] == ROLE_MINIMAX_SEMI and random.random() < ERROR_PROB:
-                col = random.choice(valid_moves)
-            else:
-                col, _ = minimax(tablero, MAX_DEPTH, -math.inf, math.inf, True, pieza_max)
-
-            if movimiento_valido(tablero, col):
-                fila = siguiente_fila_vacia(tablero, col)
-                color = ROJO if turno == J1 else AMARILLO
-                animar_caida(col, fila, color)
-                soltar_pieza(tablero, fila, col, turno)
-
-                gan = verificar_ganador(tablero, turno)
-                if gan:
-                    posiciones_ganadoras = gan
-                    fin_partida(turno)
-                elif tablero_lleno(tablero):
-                    fin_partida(None)
+        if state == "menu":
+            dibujar_menu()
+            continue
+
+        # Si estamos en juego:
+        if state == "game":
+            # En turbo las jugadas no se dibujan; se decide antes del HUD si toca un frame
+            render_activo = velocidad_actual()[3] == 0
+            actualizar_ritmo()
+
+            # Turno IA Aprendiz (TD)
+            if not game_over and player_roles.get(turno) == ROLE_TD:
+                esperar(120)
+                # Registrar estado actual para TD
+                key = get_state_key(tablero, apprentice_mark)
+                episode_states.append(key)
+
+                epsilon = EPSILON_TRAIN if game_mode in (2, 3, 4) else EPSILON_HUMAN
+                col, tipo = td_elegir_movimiento(tablero, apprentice_mark, epsilon)
+                if col is not None and movimiento_valido(tablero, col):
+                    fila = siguiente_fila_vacia(tablero, col)
+                    color = ROJO if apprentice_mark == J1 else AMARILLO
+                    animar_caida(col, fila, color)
+                    soltar_pieza(tablero, fila, col, apprentice_mark)
+                    registro.jugada(col)
+
+                    # Info de depuración
+                    ultimo_mov_td = tipo
+                    epsilon_actual = epsilon
+                    key2 = get_state_key(tablero, apprentice_mark)
+                    valor_estado_actual = V.get(key2, 0.0)
+                    episode_states.append(key2)
+
+                    gan = verificar_ganador_desde(tablero, fila, col, apprentice_mark)
+                    if gan:
+                        posiciones_ganadoras = gan
+                        fin_partida(apprentice_mark)
+                    elif tablero_lleno(tablero):
+                        fin_partida(None)
+                    else:
+                        turno = J1 if apprentice_mark == J2 else J2
+
+                    dibujar_tablero(tablero)
+
+            # Turno IA Minimax (perfecta o semiperfecta) o MCTS
+            if not game_over and player_roles.get(turno) in (ROLE_MINIMAX_PERF, ROLE_MINIMAX_SEMI, ROLE_MCTS):
+                esperar(120)
+                pieza_max = turno
+                valid_moves = get_valid_locations(tablero)
+
+                if player_roles[turno] == ROLE_MCTS:
+                    col = agente_mcts.elegir(tablero, turno)
+                    telemetria.contar("mcts_playouts", agente_mcts.ultimas_playouts)
+                    telemetria.medir("mcts_velocidad_playouts", agente_mcts.playouts_por_seg)
+                elif player_roles[turno] == ROLE_MINIMAX_SEMI and random.random() < ERROR_PROB:
+                    col = random.choice(valid_moves)
                 else:
-                    turno = J1 if turno == J2 else J2
-
+                    col = jugada_minimax(tablero, pieza_max)
+
+                if movimiento_valido(tablero, col):
+                    fila = siguiente_fila_vacia(tablero, col)
+                    color = ROJO if turno == J1 else AMARILLO
+                    animar_caida(col, fila, color)
+                    soltar_pieza(tablero, fila, col, turno)
+                    registro.jugada(col)
+
+                    gan = verificar_ganador_desde(tablero, fila, col, turno)
+                    if gan:
+                        posiciones_ganadoras = gan
+                        fin_partida(turno)
+                    elif tablero_lleno(tablero):
+                        fin_partida(None)
+                    else:
+                        turno = J1 if turno == J2 else J2
+
+                    dibujar_tablero(tablero)
+
+            # DIBUJO HUD SUPERIOR + PANEL DERECHO (en turbo, solo cuando toca un frame)
+            if not render_activo and toca_dibujar():
+                render_activo = True
                 dibujar_tablero(tablero)
-
-        # DIBUJO HUD SUPERIOR + PANEL DERECHO
-        pygame.draw.rect(screen, NEGRO, (0, 0, width, SQUARESIZE))
-
-        # Mensaje de ganador (modo humano o no, solo informativo)
-        if game_over:
-            if ultimo_ganador is None:
-                color_txt = BLANCO
-            else:
-                color_txt = ROJO if ultimo_ganador == J1 else AMARILLO
-            text_g = fuente.render(ganador_texto, True, color_txt)
-            screen.blit(text_g, (10, 5))
-            if not auto_restart and game_mode == 1:
-                text_r = fuente_small.render("Presiona ESPACIO para siguiente partida", True, BLANCO)
-                screen.blit(text_r, (10, 50))
-
-        # Panel derecho
-        panel_rect = (COLUMN_COUNT*SQUARESIZE, 0, width-COLUMN_COUNT*SQUARESIZE, height)
-        dibujar_degradado_vertical(screen, panel_rect, (40,40,40), (0,0,0))
-        px = COLUMN_COUNT * SQUARESIZE + 20
-
-        # Stats persistentes del modo actual
-        m = stats.get(game_mode, {"games":0,"td_wins":0,"opp_wins":0,"draws":0})
-        total_modo = max(1, m["games"])
-        winrate = 100.0 * m["td_wins"] / total_modo
-
-        screen.blit(fuente_small.render(f"Modo: {mode_labels.get(game_mode,'')}", True, BLANCO), (px, 10))
-        screen.blit(fuente_small.render(f"Partida sesión: {num_games}", True, BLANCO), (px, 40))
-        screen.blit(fuente_small.render(f"Partidas totales (modo): {m['games']}", True, BLANCO), (px, 70))
-        screen.blit(fuente_small.render(f"TD gana: {m['td_wins']} | Rival: {m['opp_wins']} | Emp: {m['draws']}", True, BLANCO), (px, 100))
-        screen.blit(fuente_small.render(f"Winrate TD: {winrate:.1f}%", True, BLANCO), (px, 130))
-
-        screen.blit(fuente_small.render(f"Estados aprendidos: {len(V)}", True, BLANCO), (px, 170))
-        screen.blit(fuente_small.render(f"Último mov TD: {ultimo_mov_td}", True, BLANCO), (px, 200))
-        screen.blit(fuente_small.render(f"Valor V(s): {valor_estado_actual:.3f}", True, BLANCO), (px, 230))
-        screen.blit(fuente_small.render(f"Epsilon: {epsilon_actual:.2f}", True, BLANCO), (px, 260))
-
-        # Ficha fantasma para humano (solo modo humano)
-        if not game_over and player_roles.get(turno) == ROLE_HUMANO:
-            pygame.draw.circle(screen, ROJO,
-                (int(columna_actual*SQUARESIZE+SQUARESIZE/2), int(SQUARESIZE/2)), RADIUS)
-
-        # Línea ganadora
-        if posiciones_ganadoras:
-            dibujar_linea_ganadora(posiciones_ganadoras)
-
-        pygame.display.update()
-
-        # Auto-reinicio en modos IA vs IA
-        if game_over and auto_restart:
-            pygame.time.wait(150)
-            nueva_partida()
+            if render_activo:
+                pygame.draw.rect(screen, NEGRO, (0, 0, width, SQUARESIZE))
+
+                # Mensaje de ganador (modo humano o no, solo informativo)
+                if game_over:
+                    if ultimo_ganador is None:
+                        color_txt = BLANCO
+                    else:
+                        color_txt = ROJO if ultimo_ganador == J1 else AMARILLO
+                    text_g = fuente.render(ganador_texto, True, color_txt)
+                    screen.blit(text_g, (10, 5))
+                    if not auto_restart and game_mode == 1:
+                        text_r = fuente_small.render("Presiona ESPACIO para siguiente partida", True, BLANCO)
+                        screen.blit(text_r, (10, 50))
+
+                # Panel derecho
+                panel_rect = (COLUMN_COUNT*SQUARESIZE, 0, width-COLUMN_COUNT*SQUARESIZE, height)
+                dibujar_degradado_vertical(screen, panel_rect, (40,40,40), (0,0,0))
+                px = COLUMN_COUNT * SQUARESIZE + 20
+
+                # Stats persistentes del modo actual
+                m = stats.get(game_mode, {"games":0,"td_wins":0,"opp_wins":0,"draws":0})
+                total_modo = max(1, m["games"])
+                winrate = 100.0 * m["td_wins"] / total_modo
+
+                screen.blit(fuente_small.render(f"Modo: {mode_labels.get(game_mode,'')}", True, BLANCO), (px, 10))
+                screen.blit(fuente_small.render(f"Partida sesión: {num_games}", True, BLANCO), (px, 40))
+                screen.blit(fuente_small.render(f"Partidas totales (modo): {m['games']}", True, BLANCO), (px, 70))
+                screen.blit(fuente_small.render(f"TD gana: {m['td_wins']} | Rival: {m['opp_wins']} | Emp: {m['draws']}", True, BLANCO), (px, 100))
+                screen.blit(fuente_small.render(f"Winrate TD: {winrate:.1f}%", True, BLANCO), (px, 130))
+
+                screen.blit(fuente_small.render(f"Estados aprendidos: {len(V)}", True, BLANCO), (px, 170))
+                screen.blit(fuente_small.render(f"Último mov TD: {ultimo_mov_td}", True, BLANCO), (px, 200))
+                screen.blit(fuente_small.render(f"Valor V(s): {valor_estado_actual:.3f}", True, BLANCO), (px, 230))
+                screen.blit(fuente_small.render(f"Epsilon: {epsilon_actual:.2f}", True, BLANCO), (px, 260))
+                if auto_restart:
+                    screen.blit(fuente_small.render(f"Velocidad (+/-): {velocidad_actual()[0]} | {partidas_por_seg:.1f} partidas/s", True, BLANCO), (px, 290))
+                if game_mode == 4:
+                    screen.blit(fuente_small.render(f"MCTS: {agente_mcts.playouts_por_seg:.0f} playouts/s", True, BLANCO), (px, 320))
+                if v_solo_lectura and apprentice_mark is not None:
+                    screen.blit(fuente_small.render("V solo lectura: otro proceso entrena", True, ROJO), (px, 350))
+
+                # Ficha fantasma para humano (solo modo humano)
+                if not game_over and player_roles.get(turno) == ROLE_HUMANO:
+                    pygame.draw.circle(screen, ROJO,
+                        (int(columna_actual*SQUARESIZE+SQUARESIZE/2), int(SQUARESIZE/2)), RADIUS)
+
+                # Línea ganadora
+                if posiciones_ganadoras:
+                    dibujar_linea_ganadora(posiciones_ganadoras)
+
+                pygame.display.update()
+
+            # Auto-reinicio en modos IA vs IA
+            if game_over and auto_restart:
+                esperar(150)
+                # En turbo el tablero vacío no se dibuja: el final que se acaba de mostrar queda en pantalla
+                render_activo = velocidad_actual()[3] == 0
+                nueva_partida()
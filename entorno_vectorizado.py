@@ -0,0 +1,212 @@
+import time
+
+import numpy as np
+
+# -------- ENTORNO VECTORIZADO --------
+#
+# N partidas avanzando a la vez sobre un solo arreglo (N, filas, columnas)
+# int8, con la misma orientación que los tableros de connect_4_ia (fila 0
+# abajo). Una llamada a step() juega una ficha en cada tablero, detecta
+# victorias y empates, y reinicia las partidas terminadas; todo con
+# operaciones de arreglos, sin bucles de Python por tablero.
+#
+# La victoria se revisa solo en las ventanas que pasan por la ficha recién
+# puesta (como verificar_ganador_desde), precalculadas por casilla y
+# rellenadas hasta el máximo con una máscara de ventanas válidas.
+
+J1, J2 = 1, 2
+
+
+def ventanas_por_celda(filas, columnas, conecta):
+    """(índices planos (celdas, K, conecta), máscara de válidas (celdas, K)) de las ventanas de cada casilla."""
+    por_celda = [[] for _ in range(filas * columnas)]
+    for dr, dc in ((0, 1), (1, 0), (1, 1), (-1, 1)):
+        for r in range(filas):
+            for c in range(columnas):
+                fin_r, fin_c = r + dr * (conecta - 1), c + dc * (conecta - 1)
+                if not (0 <= fin_r < filas and 0 <= fin_c < columnas):
+                    continue
+                ventana = [(r + i * dr) * columnas + (c + i * dc) for i in range(conecta)]
+                for celda in ventana:
+                    por_celda[celda].append(ventana)
+    k = max(len(v) for v in por_celda)
+    indices = np.zeros((filas * columnas, k, conecta), dtype=np.intp)
+    validas = np.zeros((filas * columnas, k), dtype=np.bool_)
+    for celda, ventanas in enumerate(por_celda):
+        if ventanas:
+            indices[celda, :len(ventanas)] = ventanas
+            validas[celda, :len(ventanas)] = True
+    return indices, validas
+
+
+class EntornoVectorizado:
+    def __init__(self, n, filas=6, columnas=7, conecta=4, semilla=None):
+        self.n = n
+        self.filas = filas
+        self.columnas = columnas
+        self.conecta = conecta
+        self.rng = np.random.default_rng(semilla)
+        self.tableros = np.zeros((n, filas, columnas), dtype=np.int8)
+        self.alturas = np.zeros((n, columnas), dtype=np.int8)     # Próxima fila vacía de cada columna
+        self.jugadas = np.zeros(n, dtype=np.int16)
+        self.turnos = np.zeros(n, dtype=np.int8)
+        self._todos = np.arange(n)
+        self.ventanas, self.ventanas_validas = ventanas_por_celda(filas, columnas, conecta)
+        self.reiniciar()
+
+    def reiniciar(self, cuales=None):
+        """Vacía los tableros indicados (máscara o índices; todos si None) y sortea quién empieza."""
+        if cuales is None:
+            cuales = self._todos
+        self.tableros[cuales] = 0
+        self.alturas[cuales] = 0
+        self.jugadas[cuales] = 0
+        self.turnos[cuales] = self.rng.integers(J1, J2 + 1, size=self.n, dtype=np.int8)[cuales]
+
+    def validas(self):
+        """Máscara (N, columnas) de columnas donde se puede jugar."""
+        return self.alturas < self.filas
+
+    def acciones_aleatorias(self):
+        """Una columna válida al azar por tablero."""
+        return np.argmax(self.rng.random((self.n, self.columnas)) * self.validas(), axis=1)
+
+    def step(self, acciones):
+        """
+        Juega acciones[i] en el tablero i con la ficha de quien tiene el turno.
+        Devuelve (terminadas, ganadores): ganadores es la marca ganadora o 0 si
+        la partida no terminó o terminó en empate. Las partidas terminadas se
+        reinician antes de devolver.
+        """
+        acciones = np.asarray(acciones, dtype=np.intp)
+        filas = self.alturas[self._todos, acciones].astype(np.intp)
+        if (filas >= self.filas).any():
+            raise ValueError("Jugada en una columna llena")
+        piezas = self.turnos.copy()
+        self.tableros[self._todos, filas, acciones] = piezas
+        self.alturas[self._todos, acciones] += 1
+        self.jugadas += 1
+
+        celdas = filas * self.columnas + acciones
+        planos = self.tableros.reshape(self.n, -1)
+        valores = planos[self._todos[:, None, None], self.ventanas[celdas]]
+        completas = (valores == piezas[:, None, None]).all(axis=2) & self.ventanas_validas[celdas]
+        gana = completas.any(axis=1)
+
+        terminadas = gana | (self.jugadas == self.filas * self.columnas)
+        ganadores = np.where(gana, piezas, 0).astype(np.int8)
+        self.turnos = (3 - piezas).astype(np.int8)
+        if terminadas.any():
+            self.reiniciar(terminadas)
+        return terminadas, ganadores
+
+
+# -------- TD EPSILON-GREEDY EN LOTE --------
+
+def claves_estado(planos, marca):
+    """Claves de get_state_key para un arreglo (M, filas*columnas) de tableros planos."""
+    if len(planos) == 0:
+        return []
+    texto = np.ascontiguousarray(planos + ord("0"), dtype=np.uint8)
+    sufijo = f"_{marca}"
+    return [b.decode("ascii") + sufijo for b in texto.view(f"S{texto.shape[1]}").ravel().tolist()]
+
+
+def td_elegir_lote(entorno, V, indices, marca, epsilon):
+    """
+    Igual que td_elegir_movimiento para los tableros `indices`: con prob.
+    epsilon una columna al azar; si no, la de mayor V tras jugar (empates al azar).
+    """
+    rng = entorno.rng
+    m, columnas = len(indices), entorno.columnas
+    validas = entorno.validas()[indices]
+    acciones = np.argmax(rng.random((m, columnas)) * validas, axis=1)
+
+    explotar = np.flatnonzero(rng.random(m) >= epsilon)
+    if len(explotar) == 0:
+        return acciones
+    sel = indices[explotar]
+    k = len(sel)
+    # Los `columnas` estados siguientes de cada tablero, todos a la vez
+    siguientes = np.repeat(entorno.tableros[sel].reshape(k, 1, -1), columnas, axis=1)
+    alturas = entorno.alturas[sel].astype(np.intp)
+    cols = np.arange(columnas)
+    puede = validas[explotar]
+    celdas = np.minimum(alturas, entorno.filas - 1) * columnas + cols
+    fila_i, col_i = np.nonzero(puede)
+    siguientes[fila_i, col_i, celdas[fila_i, col_i]] = marca
+
+    claves = claves_estado(siguientes.reshape(k * columnas, -1), marca)
+    valores = np.fromiter((V.get(c, 0.0) for c in claves), dtype=np.float64, count=k * columnas)
+    valores = np.where(puede, valores.reshape(k, columnas), -np.inf)
+    mejores = valores == valores.max(axis=1, keepdims=True)
+    acciones[explotar] = np.argmax(rng.random((k, columnas)) * mejores, axis=1)
+    return acciones
+
+
+def entrenar_td(entorno, V, partidas, alpha, epsilon, marca=J1, telemetria=None):
+    """
+    Aprendiz TD (marca) contra un rival aleatorio en todos los tableros a la vez.
+    Al terminar cada partida actualiza sus estados como actualizar_td:
+    V(s) += alpha * (recompensa - V(s)). Devuelve (ganadas, perdidas, empates, jugadas/s).
+    Con `telemetria` cuenta partidas y actualizaciones y la exporta cuando toca.
+    """
+    episodios = [[] for _ in range(entorno.n)]
+    resultados = {1.0: 0, -1.0: 0, 0.0: 0}
+    jugadas = 0
+    t0 = time.perf_counter()
+    while sum(resultados.values()) < partidas:
+        acciones = entorno.acciones_aleatorias()
+        aprendiz = np.flatnonzero(entorno.turnos == marca)
+        if len(aprendiz):
+            cols = td_elegir_lote(entorno, V, aprendiz, marca, epsilon)
+            acciones[aprendiz] = cols
+            # Se aprende el estado tras la jugada, que es el que consulta td_elegir_movimiento
+            planos = entorno.tableros[aprendiz].reshape(len(aprendiz), -1)
+            celdas = entorno.alturas[aprendiz, cols].astype(np.intp) * entorno.columnas + cols
+            planos[np.arange(len(aprendiz)), celdas] = marca
+            for i, clave in zip(aprendiz.tolist(), claves_estado(planos, marca)):
+                episodios[i].append(clave)
+
+        terminadas, ganadores = entorno.step(acciones)
+        jugadas += entorno.n
+        actualizaciones = 0
+        for i in np.flatnonzero(terminadas).tolist():
+            g = ganadores[i]
+            recompensa = 0.0 if g == 0 else (1.0 if g == marca else -1.0)
+            resultados[recompensa] += 1
+            for clave in episodios[i]:
+                old = V.get(clave, 0.0)
+                V[clave] = old + alpha * (recompensa - old)
+            actualizaciones += len(episodios[i])
+            episodios[i] = []
+        if telemetria is not None:
+            telemetria.contar("partidas", int(terminadas.sum()))
+            telemetria.contar("td_actualizaciones", actualizaciones)
+            telemetria.exportar_si_toca()
+    dt = max(time.perf_counter() - t0, 1e-9)
+    return resultados[1.0], resultados[-1.0], resultados[0.0], jugadas / dt
+
+
+if __name__ == "__main__":
+    # Entrenamiento rápido sin GUI: python entorno_vectorizado.py [partidas] [tableros] [epsilon]
+    import sys
+    import connect_4_ia as juego
+
+    partidas = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 1024
+    epsilon = float(sys.argv[3]) if len(sys.argv) > 3 else juego.EPSILON_TRAIN
+
+    juego.cargar_valores()
+    juego.tomar_escritura_valores()
+    entorno = EntornoVectorizado(n, juego.ROW_COUNT, juego.COLUMN_COUNT, juego.CONNECT_N)
+    ganadas, perdidas, empates, ritmo = entrenar_td(entorno, juego.V, partidas, juego.ALPHA, epsilon,
+                                                    telemetria=juego.telemetria)
+    if not juego.guardar_valores():
+        print(f"No se guardó {juego.VALUES_FILE}: otro proceso es el escritor o tiene una versión más nueva.")
+    juego.publicador_valores().liberar()
+    juego.telemetria.exportar()
+    total = max(1, ganadas + perdidas + empates)
+    print(f"{total} partidas vs aleatorio: TD gana {100.0 * ganadas / total:.1f}% "
+          f"| pierde {100.0 * perdidas / total:.1f}% | empata {100.0 * empates / total:.1f}%")
+    print(f"{ritmo:,.0f} jugadas/s con {n} tableros. Estados en V: {len(juego.V)}")
@@ -0,0 +1,152 @@
+import math
+import time
+import random
+
+from tabla_finales import Bitboard
+
+# -------- MONTE CARLO TREE SEARCH (UCT) --------
+#
+# Árbol sobre bitboards (ver tabla_finales.Bitboard). Cada nodo guarda las
+# visitas y victorias del jugador que hizo la jugada que lleva a él. Entre
+# jugadas consecutivas se reutiliza el subárbol de la posición actual.
+
+
+class Nodo:
+    __slots__ = ("actual", "mascara", "jugo", "padre", "col", "hijos",
+                 "sin_probar", "visitas", "victorias", "ganador", "lleno")
+
+    def __init__(self, bb, actual, mascara, jugo, padre=None, col=None, ganador=None):
+        self.actual = actual          # Piezas de quien mueve en este nodo
+        self.mascara = mascara
+        self.jugo = jugo              # Marca (1 ó 2) de quien jugó para llegar aquí
+        self.padre = padre
+        self.col = col
+        self.hijos = []
+        self.visitas = 0
+        self.victorias = 0.0
+        self.ganador = ganador        # Marca ganadora si la jugada que llevó aquí ganó
+        self.sin_probar = [] if ganador is not None else [
+            c for c in range(bb.columnas) if bb.puede_jugar(mascara, c)
+        ]
+        random.shuffle(self.sin_probar)
+        self.lleno = ganador is None and not self.sin_probar
+
+    def terminal(self):
+        return self.ganador is not None or self.lleno
+
+
+class MCTS:
+    def __init__(self, filas, columnas, conecta, tiempo_ms=300, max_playouts=0,
+                 c_uct=1.4, playout_heuristico=True):
+        self.bb = Bitboard(filas, columnas, conecta)
+        self.tiempo_ms = tiempo_ms
+        self.max_playouts = max_playouts      # 0 = sin límite (solo tiempo)
+        self.c_uct = c_uct
+        self.playout_heuristico = playout_heuristico
+        self.raiz = None
+        self.ultimas_playouts = 0
+        self.playouts_por_seg = 0.0
+        self.reutilizadas = 0                 # Visitas heredadas del árbol anterior
+
+    # -------- REUTILIZACIÓN DEL ÁRBOL --------
+
+    def _buscar_raiz(self, actual, mascara, mover):
+        """Busca la posición actual entre los hijos y nietos de la raíz anterior."""
+        if self.raiz is None:
+            return None
+        candidatos = [self.raiz] + self.raiz.hijos
+        for n in self.raiz.hijos:
+            candidatos += n.hijos
+        for n in candidatos:
+            if n.mascara == mascara and n.actual == actual and n.jugo != mover:
+                return n
+        return None
+
+    # -------- UCT --------
+
+    def _seleccionar(self, nodo):
+        while not nodo.sin_probar and nodo.hijos:
+            log_n = math.log(nodo.visitas)
+            c = self.c_uct
+            nodo = max(nodo.hijos, key=lambda h: h.victorias / h.visitas
+                       + c * math.sqrt(log_n / h.visitas))
+        return nodo
+
+    def _expandir(self, nodo):
+        col = nodo.sin_probar.pop()
+        mover = 1 if nodo.jugo == 2 else 2
+        gana = self.bb.gana_con(nodo.actual, nodo.mascara, col)
+        actual, mascara = self.bb.jugar(nodo.actual, nodo.mascara, col)
+        hijo = Nodo(self.bb, actual, mascara, mover, nodo, col, mover if gana else None)
+        nodo.hijos.append(hijo)
+        return hijo
+
+    def _playout(self, nodo):
+        """Partida hasta el final; devuelve la marca ganadora o None (empate)."""
+        if nodo.ganador is not None:
+            return nodo.ganador
+        bb = self.bb
+        actual, mascara = nodo.actual, nodo.mascara
+        mover = 1 if nodo.jugo == 2 else 2
+        cols = range(bb.columnas)
+        while True:
+            jugables = [c for c in cols if not (mascara & bb.tope[c])]
+            if not jugables:
+                return None
+            col = None
+            if self.playout_heuristico:
+                # Ligero: gana si puede en una jugada, si no al azar
+                for c in jugables:
+                    if bb.gana_con(actual, mascara, c):
+                        return mover
+            else:
+                col = random.choice(jugables)
+                if bb.gana_con(actual, mascara, col):
+                    return mover
+            if col is None:
+                col = random.choice(jugables)
+            actual, mascara = actual ^ mascara, mascara | (mascara + bb.fondo[col])
+            mover = 1 if mover == 2 else 2
+
+    def _propagar(self, nodo, ganador):
+        while nodo is not None:
+            nodo.visitas += 1
+            if ganador is None:
+                nodo.victorias += 0.5
+            elif ganador == nodo.jugo:
+                nodo.victorias += 1.0
+            nodo = nodo.padre
+
+    def elegir(self, tablero, mover):
+        """Columna para `mover` en `tablero` (NumPy) dentro del presupuesto de tiempo/playouts."""
+        actual, mascara = self.bb.desde_tablero(tablero, mover)
+        raiz = self._buscar_raiz(actual, mascara, mover)
+        if raiz is None:
+            raiz = Nodo(self.bb, actual, mascara, 1 if mover == 2 else 2)
+        raiz.padre = None
+        self.reutilizadas = raiz.visitas
+
+        t0 = time.perf_counter()
+        limite = t0 + self.tiempo_ms / 1000.0
+        n = 0
+        while True:
+            nodo = self._seleccionar(raiz)
+            if nodo.sin_probar:
+                nodo = self._expandir(nodo)
+            self._propagar(nodo, self._playout(nodo))
+            n += 1
+            if self.max_playouts and n >= self.max_playouts:
+                break
+            if not (n & 15) and time.perf_counter() >= limite:
+                break
+
+        dt = max(time.perf_counter() - t0, 1e-9)
+        self.ultimas_playouts = n
+        self.playouts_por_seg = n / dt
+
+        if not raiz.hijos:
+            return None
+        mejor = max(raiz.hijos, key=lambda h: h.visitas)
+        # La próxima búsqueda parte de aquí (o de un nieto, tras la jugada rival)
+        self.raiz = mejor
+        return mejor.col
@@ -0,0 +1,235 @@
+import os
+import struct
+from collections import namedtuple
+
+import numpy as np
+
+# -------- REGISTRO BINARIO DE PARTIDAS --------
+#
+# Formato (little endian), solo se añade al final del archivo:
+#
+#   Cabecera:  b"C4LG" | versión u8 | filas u8 | columnas u8 | conecta u8
+#   Partida:   flags u8 | rol J1 u8 | rol J2 u8 | modo u8 | n_jugadas u16
+#              | tablero inicial (2 planos de bits, J1 y J2)
+#              | jugadas empaquetadas de a dos por byte (4 bits por columna)
+#
+#   flags: bits 0-1 ganador (0 = empate, 1 = J1, 2 = J2), bits 2-3 quién abre.
+#
+# La versión 1 no tenía el byte de conecta; esos registros se leen como de
+# conecta 4. Con 4 bits por jugada caben a lo sumo 16 columnas: en tableros
+# más anchos el registro queda desactivado.
+
+MAGIC = b"C4LG"
+VERSION = 2
+CABECERA_V1 = struct.Struct("<4sBBB")
+CABECERA = struct.Struct("<4sBBBB")
+PARTIDA = struct.Struct("<BBBBH")
+MAX_COLUMNAS = 16
+
+# Código de cada rol en el archivo; solo se añaden roles nuevos al final
+ROLES = ["human", "td", "minimax_perfect", "minimax_semi", "mcts"]
+
+Partida = namedtuple("Partida", "filas columnas conecta modo roles primero ganador inicio jugadas")
+
+
+def codigo_rol(rol):
+    return ROLES.index(rol) if rol in ROLES else 255
+
+
+def empaquetar_tablero(tablero):
+    flat = np.asarray(tablero).ravel()
+    return np.packbits(np.concatenate((flat == 1, flat == 2))).tobytes()
+
+
+def desempaquetar_tablero(datos, filas, columnas):
+    n = filas * columnas
+    planos = np.unpackbits(np.frombuffer(datos, dtype=np.uint8), count=2 * n)
+    return (planos[:n] + 2 * planos[n:]).reshape(filas, columnas).astype(float)
+
+
+def empaquetar_jugadas(jugadas):
+    movs = np.zeros(len(jugadas) + len(jugadas) % 2, dtype=np.uint8)
+    movs[:len(jugadas)] = jugadas
+    return ((movs[0::2] << 4) | movs[1::2]).tobytes()
+
+
+def desempaquetar_jugadas(datos, n):
+    arr = np.frombuffer(datos, dtype=np.uint8)
+    movs = np.empty(2 * len(arr), dtype=np.uint8)
+    movs[0::2] = arr >> 4
+    movs[1::2] = arr & 0x0F
+    return movs[:n]
+
+
+def leer_cabecera(f):
+    """(versión, filas, columnas, conecta) del registro abierto en f, o None si está vacío."""
+    cab = f.read(CABECERA_V1.size)
+    if len(cab) < CABECERA_V1.size:
+        return None
+    magic, version, filas, columnas = CABECERA_V1.unpack(cab)
+    if magic != MAGIC or version not in (1, VERSION):
+        raise ValueError(f"{f.name} no es un registro de partidas válido")
+    conecta = 4
+    if version >= 2:
+        extra = f.read(CABECERA.size - CABECERA_V1.size)
+        if len(extra) < CABECERA.size - CABECERA_V1.size:
+            return None
+        conecta = extra[0]
+    return version, filas, columnas, conecta
+
+
+class RegistroPartidas:
+    """
+    Escritor del registro: acumula las jugadas en una lista y escribe una sola
+    vez por partida. Con más de MAX_COLUMNAS columnas no escribe nada (activo es False).
+    """
+
+    def __init__(self, ruta, filas, columnas, conecta):
+        self.ruta = ruta
+        self.filas = filas
+        self.columnas = columnas
+        self.conecta = conecta
+        self.activo = columnas <= MAX_COLUMNAS
+        self.bytes_tablero = (2 * filas * columnas + 7) // 8
+        self.archivo = None
+        self.jugadas = []
+        self.inicio = None
+        self.primero = 0
+        self.roles = (255, 255)
+        self.modo = 0
+
+    def abrir(self):
+        nuevo = not os.path.exists(self.ruta) or os.path.getsize(self.ruta) == 0
+        if not nuevo:
+            with open(self.ruta, "rb") as f:
+                cab = leer_cabecera(f)
+            if cab is None or cab[1:] != (self.filas, self.columnas, self.conecta):
+                raise ValueError(f"{self.ruta} no es un registro de {self.filas}x{self.columnas} "
+                                 f"conecta {self.conecta}")
+        self.archivo = open(self.ruta, "ab")
+        if nuevo:
+            self.archivo.write(CABECERA.pack(MAGIC, VERSION, self.filas, self.columnas, self.conecta))
+
+    def iniciar(self, tablero, primero, roles, modo):
+        self.inicio = empaquetar_tablero(tablero)
+        self.primero = primero
+        self.roles = (codigo_rol(roles.get(1)), codigo_rol(roles.get(2)))
+        self.modo = modo or 0
+        self.jugadas = []
+
+    def jugada(self, col):
+        self.jugadas.append(col)
+
+    def terminar(self, ganador):
+        if self.inicio is None or not self.activo:
+            return
+        if self.archivo is None:
+            self.abrir()
+        flags = (ganador or 0) | (self.primero << 2)
+        self.archivo.write(
+            PARTIDA.pack(flags, self.roles[0], self.roles[1], self.modo, len(self.jugadas))
+            + self.inicio
+            + empaquetar_jugadas(self.jugadas)
+        )
+        self.inicio = None
+
+    def cerrar(self):
+        if self.archivo is not None:
+            self.archivo.close()
+            self.archivo = None
+
+
+def leer_partidas(ruta, tam_bloque=1 << 20):
+    """Generador que recorre el registro partida a partida sin cargar el archivo entero."""
+    with open(ruta, "rb", buffering=tam_bloque) as f:
+        cab = leer_cabecera(f)
+        if cab is None:
+            return
+        _, filas, columnas, conecta = cab
+        bytes_tablero = (2 * filas * columnas + 7) // 8
+
+        while True:
+            pre = f.read(PARTIDA.size)
+            if len(pre) < PARTIDA.size:
+                return   # Fin de archivo (o registro truncado por un corte)
+            flags, rol1, rol2, modo, n = PARTIDA.unpack(pre)
+            cuerpo = f.read(bytes_tablero + (n + 1) // 2)
+            if len(cuerpo) < bytes_tablero + (n + 1) // 2:
+                return
+            roles = {
+                1: ROLES[rol1] if rol1 < len(ROLES) else None,
+                2: ROLES[rol2] if rol2 < len(ROLES) else None,
+            }
+            yield Partida(
+                filas, columnas, conecta, modo, roles,
+                (flags >> 2) & 0x3,
+                (flags & 0x3) or None,
+                desempaquetar_tablero(cuerpo[:bytes_tablero], filas, columnas),
+                desempaquetar_jugadas(cuerpo[bytes_tablero:], n),
+            )
+
+
+def reproducir_en_td(rutas, juego):
+    """Reaplica las partidas registradas a actualizar_td desde el punto de vista del aprendiz."""
+    partidas = 0
+    for ruta in rutas:
+        if not os.path.exists(ruta):
+            continue
+        for p in leer_partidas(ruta):
+            if (p.filas, p.columnas, p.conecta) != (juego.ROW_COUNT, juego.COLUMN_COUNT, juego.CONNECT_N):
+                continue
+            marcas_td = [m for m in (1, 2) if p.roles[m] == juego.ROLE_TD]
+            if not marcas_td:
+                continue
+            mark = marcas_td[0]
+
+            tablero = p.inicio.copy()
+            pieza = p.primero
+            juego.episode_states = []
+            for col in p.jugadas:
+                fila = juego.siguiente_fila_vacia(tablero, col)
+                if pieza == mark:
+                    juego.episode_states.append(juego.get_state_key(tablero, mark))
+                juego.soltar_pieza(tablero, fila, col, pieza)
+                if pieza == mark:
+                    juego.episode_states.append(juego.get_state_key(tablero, mark))
+                pieza = 2 if pieza == 1 else 1
+
+            if juego.episode_states:
+                if p.ganador is None:
+                    reward = 0.0
+                elif p.ganador == mark:
+                    reward = 1.0
+                else:
+                    reward = -1.0
+                juego.actualizar_td(reward, guardar=False)
+            partidas += 1
+            juego.telemetria.contar("partidas_reproducidas")
+            juego.telemetria.exportar_si_toca()
+    return partidas
+
+
+if __name__ == "__main__":
+    import argparse
+    import connect_4_ia as juego
+
+    parser = argparse.ArgumentParser(description="Reentrena la tabla V a partir de registros de partidas.")
+    parser.add_argument("rutas", nargs="*", default=[juego.LOG_FILE])
+    parser.add_argument("--reconstruir", action="store_true",
+                        help="parte de una tabla V vacía en lugar de la guardada")
+    parser.add_argument("--salida", default=juego.VALUES_FILE)
+    args = parser.parse_args()
+
+    if not juego.publicador_valores().adquirir_escritura():
+        print(f"Otro proceso escribe {juego.VALUES_FILE}; se reentrena cuando termine.")
+        raise SystemExit(1)
+    juego.cargar_valores()
+    if args.reconstruir:
+        juego.V = {}
+    n = reproducir_en_td(args.rutas, juego)
+    juego.VALUES_FILE = args.salida
+    if not juego.guardar_valores():
+        print(f"No se guardó {args.salida}: otro proceso es el escritor o tiene una versión más nueva.")
+    juego.publicador_valores().liberar()
+    juego.telemetria.exportar()
+    print(f"Partidas reproducidas: {n}. Estados en V: {len(juego.V)}")
@@ -0,0 +1,210 @@
+import os
+import numpy as np
+
+# -------- BUFFER DE EXPERIENCIA (REPLAY) --------
+#
+# Guarda transiciones (estado, siguiente estado, recompensa, terminal) del
+# aprendiz TD en arreglos NumPy preasignados de capacidad fija. Cada estado
+# se empaqueta en dos planos de bits (piezas J1 y piezas J2), así un tablero
+# de 6x7 ocupa 11 bytes en vez de una clave de texto de 44 caracteres.
+
+PRIORIDAD_MIN = 1e-3   # Evita prioridades nulas en el muestreo priorizado
+ALPHA_PRIORIDAD = 0.6  # Se muestrea proporcional a prioridad ** ALPHA_PRIORIDAD
+
+
+def empaquetar_clave(key, n_celdas):
+    """Convierte una clave de get_state_key ('0120..._2') en (bytes empaquetados, marca)."""
+    celdas = np.frombuffer(key[:n_celdas].encode("ascii"), dtype=np.uint8) - ord("0")
+    planos = np.concatenate((celdas == 1, celdas == 2))
+    return np.packbits(planos), int(key[n_celdas + 1:])
+
+
+def desempaquetar_clave(empaquetado, marca, n_celdas):
+    """Operación inversa de empaquetar_clave: devuelve la clave de texto usada en V."""
+    planos = np.unpackbits(empaquetado, count=2 * n_celdas)
+    celdas = planos[:n_celdas] + 2 * planos[n_celdas:] + ord("0")
+    return celdas.astype(np.uint8).tobytes().decode("ascii") + f"_{marca}"
+
+
+class ArbolSumas:
+    """
+    Árbol de sumas sobre `capacidad` hojas en un solo arreglo (nodo 1 = raíz,
+    hijos de i en 2i y 2i+1, hojas al final): cambiar una hoja y buscar dónde
+    cae una suma acumulada cuesta O(log capacidad) en vez de O(capacidad).
+    """
+
+    def __init__(self, capacidad):
+        self.hojas = 1 << max(0, (int(capacidad) - 1).bit_length())
+        self.nodos = np.zeros(2 * self.hojas, dtype=np.float64)
+
+    def total(self):
+        return float(self.nodos[1])
+
+    def fijar(self, i, valor):
+        i += self.hojas
+        self.nodos[i] = valor
+        i >>= 1
+        while i:
+            self.nodos[i] = self.nodos[2 * i] + self.nodos[2 * i + 1]
+            i >>= 1
+
+    def fijar_lote(self, idx, valores):
+        i = np.asarray(idx, dtype=np.intp) + self.hojas
+        self.nodos[i] = valores
+        i = np.unique(i >> 1)
+        while i[0] > 0:
+            self.nodos[i] = self.nodos[2 * i] + self.nodos[2 * i + 1]
+            i = np.unique(i >> 1)
+
+    def reconstruir(self, valores):
+        """Hojas = valores (el resto a cero) y todos los nodos internos, nivel por nivel."""
+        self.nodos[:] = 0.0
+        self.nodos[self.hojas:self.hojas + len(valores)] = valores
+        n = self.hojas
+        while n > 1:
+            self.nodos[n // 2:n] = self.nodos[n:2 * n:2] + self.nodos[n + 1:2 * n:2]
+            n //= 2
+
+    def buscar(self, sumas):
+        """Índice de la hoja donde cae cada suma acumulada (arreglo con valores en [0, total))."""
+        sumas = np.array(sumas, dtype=np.float64)
+        i = np.ones(len(sumas), dtype=np.intp)
+        while i[0] < self.hojas:
+            izquierda = self.nodos[2 * i]
+            derecha = sumas >= izquierda
+            sumas -= izquierda * derecha
+            i = 2 * i + derecha
+        return i - self.hojas
+
+
+class ReplayBuffer:
+    """Buffer circular de transiciones con muestreo uniforme o priorizado."""
+
+    CAMPOS = ("estados", "siguientes", "marcas", "recompensas", "terminales", "prioridades")
+
+    def __init__(self, capacidad, n_celdas):
+        self.capacidad = int(capacidad)
+        self.n_celdas = int(n_celdas)
+        n_bytes = (2 * self.n_celdas + 7) // 8
+
+        self.estados = np.zeros((self.capacidad, n_bytes), dtype=np.uint8)
+        self.siguientes = np.zeros((self.capacidad, n_bytes), dtype=np.uint8)
+        self.marcas = np.zeros(self.capacidad, dtype=np.uint8)
+        self.recompensas = np.zeros(self.capacidad, dtype=np.float32)
+        self.terminales = np.zeros(self.capacidad, dtype=np.bool_)
+        self.prioridades = np.zeros(self.capacidad, dtype=np.float32)
+
+        self.pos = 0        # Próxima posición a escribir
+        self.tamano = 0     # Transiciones válidas almacenadas
+        self.prioridad_max = 1.0   # Mayor prioridad vista; recorrer el buffer en cada inserción es O(capacidad)
+        self.arbol = ArbolSumas(self.capacidad)   # prioridad ** ALPHA_PRIORIDAD de cada transición
+
+    def __len__(self):
+        return self.tamano
+
+    def agregar(self, key, key_sig, recompensa, terminal):
+        """Añade una transición a partir de claves de estado; sobrescribe la más antigua si está lleno."""
+        i = self.pos
+        self.estados[i], self.marcas[i] = empaquetar_clave(key, self.n_celdas)
+        if key_sig is not None:
+            self.siguientes[i] = empaquetar_clave(key_sig, self.n_celdas)[0]
+        else:
+            self.siguientes[i] = 0
+        self.recompensas[i] = recompensa
+        self.terminales[i] = terminal
+        # Las transiciones nuevas entran con la prioridad máxima para verse al menos una vez
+        self.prioridades[i] = self.prioridad_max
+        self.arbol.fijar(i, self.prioridad_max ** ALPHA_PRIORIDAD)
+
+        self.pos = (self.pos + 1) % self.capacidad
+        self.tamano = min(self.tamano + 1, self.capacidad)
+
+    def agregar_episodio(self, claves, recompensa):
+        """Encadena los estados de un episodio: recompensa 0 salvo en la última transición (terminal)."""
+        for i, key in enumerate(claves):
+            if i + 1 < len(claves):
+                self.agregar(key, claves[i + 1], 0.0, False)
+            else:
+                self.agregar(key, None, recompensa, True)
+
+    def muestrear(self, tam_lote, priorizado=False):
+        """Devuelve (índices, estados, siguientes, marcas, recompensas, terminales) de un minilote."""
+        if self.tamano == 0:
+            return None
+        if priorizado:
+            idx = self.arbol.buscar(np.random.random(tam_lote) * self.arbol.total())
+            idx = np.minimum(idx, self.tamano - 1)   # Por redondeo una suma puede caer justo al final
+        else:
+            idx = np.random.randint(0, self.tamano, size=tam_lote)
+        return (idx, self.estados[idx], self.siguientes[idx], self.marcas[idx],
+                self.recompensas[idx], self.terminales[idx])
+
+    def actualizar_prioridades(self, idx, errores):
+        nuevas = np.maximum(np.abs(errores), PRIORIDAD_MIN)
+        self.prioridades[idx] = nuevas
+        if len(nuevas):
+            self.arbol.fijar_lote(idx, self.prioridades[idx].astype(np.float64) ** ALPHA_PRIORIDAD)
+            self.prioridad_max = max(self.prioridad_max, float(nuevas.max()))
+
+    def clave(self, empaquetado, marca):
+        return desempaquetar_clave(empaquetado, marca, self.n_celdas)
+
+    # -------- PERSISTENCIA (.npy) --------
+
+    def guardar(self, prefijo):
+        for campo in self.CAMPOS:
+            np.save(f"{prefijo}_{campo}.npy", getattr(self, campo))
+        meta = np.array([self.capacidad, self.n_celdas, self.pos, self.tamano], dtype=np.int64)
+        np.save(f"{prefijo}_meta.npy", meta)
+
+    @classmethod
+    def cargar(cls, prefijo, capacidad, n_celdas):
+        """Carga un buffer guardado; si no existe o no es compatible devuelve uno vacío."""
+        buf = cls(capacidad, n_celdas)
+        if not os.path.exists(f"{prefijo}_meta.npy"):
+            return buf
+        try:
+            cap, celdas, pos, tamano = (int(x) for x in np.load(f"{prefijo}_meta.npy"))
+            if celdas != buf.n_celdas:
+                return buf
+            datos = {campo: np.load(f"{prefijo}_{campo}.npy") for campo in cls.CAMPOS}
+        except Exception:
+            return buf
+
+        # Conservar las transiciones más recientes si cambió la capacidad
+        orden = (np.arange(tamano) + (pos - tamano)) % cap
+        orden = orden[-buf.capacidad:]
+        for campo in cls.CAMPOS:
+            getattr(buf, campo)[:len(orden)] = datos[campo][orden]
+        buf.tamano = len(orden)
+        buf.pos = buf.tamano % buf.capacidad
+        if buf.tamano:
+            buf.prioridad_max = max(float(buf.prioridades[:buf.tamano].max()), PRIORIDAD_MIN)
+            buf.arbol.reconstruir(buf.prioridades[:buf.tamano].astype(np.float64) ** ALPHA_PRIORIDAD)
+        return buf
+
+
+if __name__ == "__main__":
+    # Entrenamiento offline: python replay_buffer.py [lotes] [tam_lote]
+    import sys
+    import connect_4_ia as juego
+
+    lotes = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    tam_lote = int(sys.argv[2]) if len(sys.argv) > 2 else 256
+
+    buf = ReplayBuffer.cargar(juego.REPLAY_PREFIX, juego.REPLAY_CAPACITY,
+                              juego.ROW_COUNT * juego.COLUMN_COUNT)
+    if len(buf) == 0:
+        print("Buffer vacío, nada que entrenar.")
+        sys.exit()
+    # Primero el lock y luego V: así nadie publica una versión más nueva mientras se entrena
+    if not juego.publicador_valores().adquirir_escritura():
+        print(f"Otro proceso escribe {juego.VALUES_FILE}; se entrena cuando termine.")
+        sys.exit(1)
+    juego.cargar_valores()
+    juego.entrenar_desde_replay(buf, lotes, tam_lote, priorizado=juego.REPLAY_PRIORIZADO)
+    if not juego.guardar_valores():
+        print(f"No se guardó {juego.VALUES_FILE}: otro proceso es el escritor o tiene una versión más nueva.")
+    juego.publicador_valores().liberar()
+    juego.telemetria.exportar()
+    print(f"Entrenados {lotes} lotes de {tam_lote} con {len(buf)} transiciones. Estados en V: {len(juego.V)}")
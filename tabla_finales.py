@@ -0,0 +1,268 @@
+import os
+import sys
+import random
+
+import numpy as np
+
+# -------- TABLA DE FINALES --------
+#
+# Resultados exactos de posiciones con a lo sumo K casillas vacías. Cada
+# posición se codifica como bitboard por columnas (filas+1 bits por columna,
+# el bit extra de arriba separa columnas):
+#
+#   clave = piezas del jugador que mueve + máscara de ocupadas + fila inferior
+#
+# que es única para cada posición vista desde quien mueve. Necesita
+# (filas+1)*columnas <= 64 para caber en un uint64 (6x7 usa 49 bits).
+#
+# valor (int8, desde el punto de vista de quien mueve):
+#   0 = empate, +s = gana dejando s-1 casillas vacías, -s = pierde igual.
+# Cuanto mayor |s|, más rápido termina la partida.
+#
+# Se guarda como tabla hash de direccionamiento abierto (potencia de 2, sondeo
+# lineal) en un .npz: la consulta es O(1) y no hay que reconstruir nada al cargar.
+
+MULT = 0x9E3779B97F4A7C15
+MASK64 = (1 << 64) - 1
+
+
+class Bitboard:
+    """
+    Operaciones de bitboard para un tamaño de tablero y longitud de línea dados.
+    Usa enteros de Python, así que sirve para cualquier tamaño; solo la tabla
+    (claves uint64) exige que quepa en 64 bits.
+    """
+
+    def __init__(self, filas, columnas, conecta):
+        self.filas = filas
+        self.columnas = columnas
+        self.conecta = conecta
+        self.h1 = filas + 1
+        self.fondo = [1 << (c * self.h1) for c in range(columnas)]
+        self.tope = [1 << (filas - 1 + c * self.h1) for c in range(columnas)]
+        self.col_mask = [((1 << filas) - 1) << (c * self.h1) for c in range(columnas)]
+        self.fila_inferior = sum(self.fondo)
+        self.desplazamientos = (1, self.h1, self.h1 - 1, self.h1 + 1)
+        # Bit de cada casilla (fila, col) del tablero NumPy, para armar la clave sin bucles
+        self.pesos = None
+        if self.h1 * columnas <= 64:
+            self.pesos = np.array([[1 << (c * self.h1 + r) for c in range(columnas)]
+                                   for r in range(filas)], dtype=np.uint64)
+
+    def desde_tablero(self, tablero, mover):
+        """(piezas de quien mueve, máscara) a partir de un tablero NumPy de connect_4_ia."""
+        actual = mascara = 0
+        for c in range(self.columnas):
+            for r in range(self.filas):
+                v = tablero[r][c]
+                if v != 0:
+                    bit = 1 << (c * self.h1 + r)
+                    mascara |= bit
+                    if v == mover:
+                        actual |= bit
+        return actual, mascara
+
+    def clave(self, actual, mascara):
+        return actual + mascara + self.fila_inferior
+
+    def clave_tablero(self, tablero, mover):
+        """Igual que clave(*desde_tablero(...)), con operaciones de NumPy (solo si cabe en 64 bits)."""
+        actual = int(self.pesos[tablero == mover].sum())
+        mascara = int(self.pesos[tablero != 0].sum())
+        return self.clave(actual, mascara)
+
+    def alineadas(self, pos):
+        for d in self.desplazamientos:
+            m = pos
+            for i in range(1, self.conecta):
+                m &= pos >> (i * d)
+                if not m:
+                    break
+            if m:
+                return True
+        return False
+
+    def puede_jugar(self, mascara, col):
+        return not (mascara & self.tope[col])
+
+    def gana_con(self, actual, mascara, col):
+        return self.alineadas(actual | ((mascara + self.fondo[col]) & self.col_mask[col]))
+
+    def jugar(self, actual, mascara, col):
+        """Devuelve (piezas del siguiente en mover, nueva máscara)."""
+        return actual ^ mascara, mascara | (mascara + self.fondo[col])
+
+
+def resolver(bb, actual, mascara, vacias, memo):
+    """Negamax exacto con memo {clave: valor}; supone que nadie ha ganado todavía."""
+    clave = bb.clave(actual, mascara)
+    valor = memo.get(clave)
+    if valor is not None:
+        return valor
+
+    jugables = [c for c in range(bb.columnas) if bb.puede_jugar(mascara, c)]
+    for c in jugables:
+        if bb.gana_con(actual, mascara, c):
+            memo[clave] = vacias
+            return vacias
+
+    mejor = 0 if not jugables else -128
+    for c in jugables:
+        a2, m2 = bb.jugar(actual, mascara, c)
+        mejor = max(mejor, -resolver(bb, a2, m2, vacias - 1, memo))
+    memo[clave] = mejor
+    return mejor
+
+
+class TablaFinales:
+    def __init__(self, filas, columnas, conecta, max_vacias, claves, valores):
+        if (filas + 1) * columnas > 64:
+            raise ValueError(f"Un tablero de {filas}x{columnas} no cabe en 64 bits")
+        self.bb = Bitboard(filas, columnas, conecta)
+        self.max_vacias = max_vacias
+        self.claves = claves
+        self.valores = valores
+        self.mascara_idx = len(claves) - 1
+        self.shift = 64 - (len(claves).bit_length() - 1)
+        self.aciertos = 0      # Consultas con pocas vacías que estaban en la tabla
+        self.fallos = 0        # ... y las que no (cobertura = aciertos / (aciertos + fallos))
+
+    def __len__(self):
+        return int(np.count_nonzero(self.claves))
+
+    def _indice(self, clave):
+        return ((clave * MULT) & MASK64) >> self.shift
+
+    def consultar_clave(self, clave):
+        i = self._indice(clave)
+        while True:
+            k = int(self.claves[i])
+            if k == clave:
+                return int(self.valores[i])
+            if k == 0:
+                return None
+            i = (i + 1) & self.mascara_idx
+
+    def consultar(self, tablero, mover, vacias=None):
+        """Valor exacto para `mover` en `tablero` (NumPy), o None si no está en la tabla."""
+        if vacias is None:
+            vacias = int(np.count_nonzero(tablero == 0))
+        if vacias > self.max_vacias:
+            return None
+        valor = self.consultar_clave(self.bb.clave_tablero(tablero, mover))
+        if valor is None:
+            self.fallos += 1
+        else:
+            self.aciertos += 1
+        return valor
+
+    # -------- CONSTRUCCIÓN Y PERSISTENCIA --------
+
+    @classmethod
+    def desde_memo(cls, filas, columnas, conecta, max_vacias, memo):
+        capacidad = 1 << max(4, (2 * len(memo) - 1).bit_length())
+        tabla = cls(filas, columnas, conecta, max_vacias,
+                    np.zeros(capacidad, dtype=np.uint64), np.zeros(capacidad, dtype=np.int8))
+        claves, valores = tabla.claves, tabla.valores
+        for clave, valor in memo.items():
+            i = tabla._indice(clave)
+            while claves[i] != 0:
+                i = (i + 1) & tabla.mascara_idx
+            claves[i] = clave
+            valores[i] = valor
+        return tabla
+
+    def guardar(self, ruta):
+        meta = np.array([self.bb.filas, self.bb.columnas, self.bb.conecta, self.max_vacias], dtype=np.int64)
+        np.savez(ruta, meta=meta, claves=self.claves, valores=self.valores)
+
+    @classmethod
+    def cargar(cls, ruta, filas, columnas, conecta):
+        """Devuelve la tabla si existe y es de la misma variante; si no, None."""
+        if not os.path.exists(ruta):
+            return None
+        try:
+            with np.load(ruta) as datos:
+                f, c, n, k = (int(x) for x in datos["meta"])
+                if (f, c, n) != (filas, columnas, conecta):
+                    return None
+                return cls(f, c, n, k, datos["claves"], datos["valores"])
+        except Exception:
+            return None
+
+
+# -------- GENERADOR OFFLINE --------
+
+def semillas_aleatorias(bb, max_vacias, cantidad):
+    """Posiciones de partidas aleatorias justo al llegar a `max_vacias` casillas vacías."""
+    total = bb.filas * bb.columnas
+    obtenidas = 0
+    while obtenidas < cantidad:
+        actual = mascara = 0
+        vacias = total
+        while vacias > max_vacias:
+            jugables = [c for c in range(bb.columnas) if bb.puede_jugar(mascara, c)]
+            c = random.choice(jugables)
+            if bb.gana_con(actual, mascara, c):
+                break
+            actual, mascara = bb.jugar(actual, mascara, c)
+            vacias -= 1
+        else:
+            obtenidas += 1
+            yield actual, mascara, vacias
+
+
+def semillas_de_registro(bb, max_vacias, rutas):
+    """Igual que semillas_aleatorias pero tomando las partidas de los registros binarios."""
+    from registro_partidas import leer_partidas
+    for ruta in rutas:
+        for p in leer_partidas(ruta):
+            if (p.filas, p.columnas, p.conecta) != (bb.filas, bb.columnas, bb.conecta):
+                continue
+            mover = p.primero
+            actual, mascara = bb.desde_tablero(p.inicio, mover)
+            vacias = int(np.count_nonzero(p.inicio == 0))
+            for col in p.jugadas:
+                if vacias <= max_vacias:
+                    break
+                if bb.gana_con(actual, mascara, col):
+                    vacias = -1
+                    break
+                actual, mascara = bb.jugar(actual, mascara, col)
+                vacias -= 1
+            if 0 <= vacias <= max_vacias and not bb.alineadas(actual ^ mascara):
+                yield actual, mascara, vacias
+
+
+def generar(filas, columnas, conecta, max_vacias, semillas, rutas_registro=(), memo=None):
+    bb = Bitboard(filas, columnas, conecta)
+    memo = {} if memo is None else memo
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 4 * filas * columnas))
+    for actual, mascara, vacias in semillas_aleatorias(bb, max_vacias, semillas):
+        resolver(bb, actual, mascara, vacias, memo)
+    for actual, mascara, vacias in semillas_de_registro(bb, max_vacias, rutas_registro):
+        resolver(bb, actual, mascara, vacias, memo)
+    return TablaFinales.desde_memo(filas, columnas, conecta, max_vacias, memo)
+
+
+if __name__ == "__main__":
+    # Uso: python tabla_finales.py K semillas [registro.c4log ...]
+    # Sin registros se usa LOG_FILE: las partidas jugadas cubren las posiciones
+    # que de verdad aparecen, las semillas aleatorias casi nunca se repiten.
+    import connect_4_ia as juego
+
+    max_vacias = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    semillas = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    rutas = [r for r in (sys.argv[3:] or [juego.LOG_FILE]) if os.path.exists(r)]
+
+    # Se amplía la tabla existente en lugar de empezar de cero
+    memo = {}
+    previa = TablaFinales.cargar(juego.ENDGAME_FILE, juego.ROW_COUNT, juego.COLUMN_COUNT, juego.CONNECT_N)
+    if previa is not None and previa.max_vacias == max_vacias:
+        ocupadas = previa.claves != 0
+        memo = dict(zip(previa.claves[ocupadas].tolist(), previa.valores[ocupadas].tolist()))
+
+    tabla = generar(juego.ROW_COUNT, juego.COLUMN_COUNT, juego.CONNECT_N,
+                    max_vacias, semillas, rutas, memo)
+    tabla.guardar(juego.ENDGAME_FILE)
+    print(f"{len(tabla)} posiciones con <= {max_vacias} vacías en {juego.ENDGAME_FILE}")
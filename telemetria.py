@@ -0,0 +1,149 @@
+import os
+import json
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# -------- TELEMETRÍA --------
+#
+# Contadores, medidores (gauges) e histogramas en memoria. Registrar un dato
+# es una suma en un diccionario; el costo de exportar se paga solo cada
+# `intervalo` segundos, cuando se escribe:
+#   - un archivo de texto en formato Prometheus (se reemplaza completo), y
+#   - una línea JSON por muestra en un archivo .jsonl (se va añadiendo).
+#
+# Las etiquetas opcionales (p. ej. {"trabajo": id}) van en cada serie de
+# Prometheus y en cada línea JSON, para distinguir procesos que escriben en
+# el mismo .jsonl.
+
+BUCKETS_TIEMPO = (1e-4, 5e-4, 1e-3, 5e-3, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+BUCKETS_MAGNITUD = (1e-4, 1e-3, 0.01, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0)
+
+
+class Histograma:
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.conteos = [0] * (len(self.buckets) + 1)   # El último es +Inf
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.conteos[bisect_left(self.buckets, valor)] += 1
+        self.suma += valor
+        self.total += 1
+
+    def acumulado(self):
+        acum, out = 0, []
+        for n in self.conteos:
+            acum += n
+            out.append(acum)
+        return out
+
+
+class Telemetria:
+    def __init__(self, prefijo="c4", ruta_prom=None, ruta_jsonl=None, intervalo=10.0, etiquetas=None):
+        self.prefijo = prefijo
+        self.etiquetas = dict(etiquetas or {})
+        self.ruta_prom = ruta_prom
+        self.ruta_jsonl = ruta_jsonl
+        self.intervalo = intervalo
+        self.contadores = {}
+        self.medidores = {}
+        self.funciones = {}        # Medidores calculados solo al exportar
+        self.histogramas = {}
+        self._ultima_exportacion = time.time()
+        self._contadores_previos = {}
+
+    # -------- REGISTRO --------
+
+    def contar(self, nombre, n=1):
+        self.contadores[nombre] = self.contadores.get(nombre, 0) + n
+
+    def medir(self, nombre, valor):
+        self.medidores[nombre] = valor
+
+    def medir_con(self, nombre, funcion):
+        self.funciones[nombre] = funcion
+
+    def observar(self, nombre, valor, buckets=BUCKETS_TIEMPO):
+        h = self.histogramas.get(nombre)
+        if h is None:
+            h = self.histogramas[nombre] = Histograma(buckets)
+        h.observar(valor)
+
+    @contextmanager
+    def cronometro(self, nombre):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(nombre, time.perf_counter() - t0)
+
+    # -------- EXPORTACIÓN --------
+
+    def muestra(self):
+        """Foto actual de todas las métricas, con tasas por segundo de los contadores."""
+        ahora = time.time()
+        dt = max(ahora - self._ultima_exportacion, 1e-9)
+        for nombre, funcion in self.funciones.items():
+            try:
+                self.medidores[nombre] = funcion()
+            except Exception:
+                pass
+        tasas = {
+            nombre: (valor - self._contadores_previos.get(nombre, 0)) / dt
+            for nombre, valor in self.contadores.items()
+        }
+        return {
+            "ts": ahora,
+            "etiquetas": dict(self.etiquetas),
+            "contadores": dict(self.contadores),
+            "tasas": tasas,
+            "medidores": dict(self.medidores),
+            "histogramas": {
+                nombre: {"buckets": list(h.buckets), "conteos": h.acumulado(),
+                         "suma": h.suma, "total": h.total}
+                for nombre, h in self.histogramas.items()
+            },
+        }
+
+    def _etiquetas(self, **extra):
+        pares = [f'{k}="{v}"' for k, v in {**extra, **self.etiquetas}.items()]
+        return "{" + ",".join(pares) + "}" if pares else ""
+
+    def formato_prometheus(self, muestra):
+        p = self.prefijo
+        e = self._etiquetas()
+        lineas = []
+        for nombre, valor in muestra["contadores"].items():
+            lineas += [f"# TYPE {p}_{nombre}_total counter", f"{p}_{nombre}_total{e} {valor}"]
+        for nombre, valor in muestra["tasas"].items():
+            lineas += [f"# TYPE {p}_{nombre}_por_seg gauge", f"{p}_{nombre}_por_seg{e} {valor:.6g}"]
+        for nombre, valor in muestra["medidores"].items():
+            lineas += [f"# TYPE {p}_{nombre} gauge", f"{p}_{nombre}{e} {valor}"]
+        for nombre, h in muestra["histogramas"].items():
+            lineas.append(f"# TYPE {p}_{nombre} histogram")
+            for le, n in zip(list(h["buckets"]) + ["+Inf"], h["conteos"]):
+                lineas.append(f"{p}_{nombre}_bucket{self._etiquetas(le=le)} {n}")
+            lineas += [f"{p}_{nombre}_sum{e} {h['suma']:.6g}", f"{p}_{nombre}_count{e} {h['total']}"]
+        return "\n".join(lineas) + "\n"
+
+    def exportar(self):
+        muestra = self.muestra()
+        if self.ruta_prom:
+            tmp = f"{self.ruta_prom}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                f.write(self.formato_prometheus(muestra))
+            os.replace(tmp, self.ruta_prom)
+        if self.ruta_jsonl:
+            with open(self.ruta_jsonl, "a") as f:
+                f.write(json.dumps(muestra) + "\n")
+        self._ultima_exportacion = muestra["ts"]
+        self._contadores_previos = dict(self.contadores)
+        return muestra
+
+    def exportar_si_toca(self):
+        """Pensado para llamarse seguido (cada frame o cada partida)."""
+        if time.time() - self._ultima_exportacion >= self.intervalo:
+            return self.exportar()
+        return None
@@ -0,0 +1,178 @@
+import os
+import time
+import uuid
+import pickle
+import threading
+
+# -------- TABLA DE VALORES COMPARTIDA ENTRE PROCESOS --------
+#
+# Un solo proceso escribe (el que tiene el archivo .lock) y el resto lee.
+#
+#   <ruta>        instantánea de V (pickle), se publica con os.replace (atómico)
+#   <ruta>.ver    número de versión, se actualiza después de cada publicación
+#   <ruta>.lock   "pid token" del escritor; su fecha de modificación es el latido
+#
+# El lock se toma al publicar (o antes, para entrenar) y un hilo del escritor
+# lo mantiene latiendo mientras el proceso vive, aunque esté ocupado horas en
+# un entrenamiento sin GUI. Un escritor que deja de latir durante
+# LOCK_VENCIDO_SEG pierde el lock. Nadie publica si no ha cargado antes la
+# última versión, así no se pisan actualizaciones de otro proceso.
+
+LOCK_VENCIDO_SEG = 120.0
+INTERVALO_REVISION_SEG = 1.0
+
+
+def _escribir_atomico(ruta, datos):
+    tmp = f"{ruta}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(datos)
+    os.replace(tmp, ruta)
+
+
+class PublicadorValores:
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.ruta_version = ruta + ".ver"
+        self.ruta_lock = ruta + ".lock"
+        self.token = f"{os.getpid()} {uuid.uuid4().hex}"
+        self.version = 0               # Última versión cargada o publicada por este proceso
+        self._ultima_revision = 0.0
+        self._hilo = None
+        self._resultado = None
+        self._latido = None
+        self._fin_latido = threading.Event()
+
+    # -------- VERSIONES --------
+
+    def leer_version(self):
+        try:
+            with open(self.ruta_version, "r") as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _leer(self):
+        version = self.leer_version()
+        try:
+            with open(self.ruta, "rb") as f:
+                valores = pickle.load(f)
+        except Exception:
+            valores = {}
+        return valores, version
+
+    def cargar(self):
+        """Lee la instantánea actual; devuelve (V, versión)."""
+        valores, version = self._leer()
+        self.version = max(self.version, version)
+        return valores, version
+
+    # -------- LOCK DE ESCRITURA --------
+
+    def _dueno_lock(self):
+        try:
+            with open(self.ruta_lock, "r") as f:
+                return f.read().strip()
+        except OSError:
+            return None
+
+    def _lock_vencido(self):
+        try:
+            return time.time() - os.path.getmtime(self.ruta_lock) > LOCK_VENCIDO_SEG
+        except OSError:
+            return True
+
+    def es_escritor(self):
+        return self._dueno_lock() == self.token
+
+    def adquirir_escritura(self, forzar=False):
+        """Toma el lock si está libre o vencido (o siempre, con forzar=True)."""
+        if self.es_escritor():
+            return True
+        dueno = self._dueno_lock()
+        if dueno is None:
+            try:
+                fd = os.open(self.ruta_lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                return False
+            with os.fdopen(fd, "w") as f:
+                f.write(self.token)
+        elif forzar or self._lock_vencido():
+            _escribir_atomico(self.ruta_lock, self.token.encode())
+            if not self.es_escritor():
+                return False
+        else:
+            return False
+        self._iniciar_latido()
+        return True
+
+    def latir(self):
+        if self.es_escritor():
+            os.utime(self.ruta_lock)
+
+    def _iniciar_latido(self):
+        if self._latido is not None and self._latido.is_alive():
+            return
+        self._fin_latido.clear()
+        self._latido = threading.Thread(target=self._latir_en_hilo, daemon=True)
+        self._latido.start()
+
+    def _latir_en_hilo(self):
+        while not self._fin_latido.wait(LOCK_VENCIDO_SEG / 4):
+            if not self.es_escritor():
+                return   # Otro proceso tomó el lock
+            self.latir()
+
+    def liberar(self):
+        self._fin_latido.set()
+        if self.es_escritor():
+            try:
+                os.remove(self.ruta_lock)
+            except OSError:
+                pass
+
+    # -------- PUBLICACIÓN --------
+
+    def publicar(self, valores):
+        """Publica V como nueva versión. Devuelve False si este proceso no puede escribir."""
+        if self.version < self.leer_version():
+            return False   # Hay una versión más nueva que no hemos cargado
+        if not self.adquirir_escritura():
+            return False
+        _escribir_atomico(self.ruta, pickle.dumps(valores, protocol=pickle.HIGHEST_PROTOCOL))
+        self.version = max(self.version, self.leer_version()) + 1
+        _escribir_atomico(self.ruta_version, str(self.version).encode())
+        self.latir()
+        return True
+
+    # -------- LECTURA EN CALIENTE --------
+
+    def _cargar_en_hilo(self):
+        self._resultado = self._leer()
+
+    def revisar(self):
+        """
+        Pensado para llamarse en cada frame. Si hay una versión nueva la carga en
+        un hilo aparte y, cuando termina, devuelve el V nuevo; si no, None.
+        """
+        if self._hilo is not None:
+            if self._hilo.is_alive():
+                return None
+            self._hilo = None
+            valores, version = self._resultado
+            self._resultado = None
+            # La versión se marca como vista solo cuando el llamador reemplaza V
+            self.version = max(self.version, version)
+            return valores
+
+        ahora = time.time()
+        if ahora - self._ultima_revision < INTERVALO_REVISION_SEG:
+            return None
+        self._ultima_revision = ahora
+
+        # El lock no se toma aquí: un lector ocioso no debe bloquear a los demás
+        # escritores. También el escritor adopta una versión más nueva (la que
+        # publicó el anterior justo mientras se le quitaba el lock).
+        if self.leer_version() > self.version:
+            self._hilo = threading.Thread(target=self._cargar_en_hilo, daemon=True)
+            self._hilo.start()
+        return None